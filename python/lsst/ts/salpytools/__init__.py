@@ -28,3 +28,15 @@ from .version import *
 
 from .salpylib import *
 from .state_transition_exception import *
+from .manager_pool import *
+from .ring_buffer import *
+from .topic_schema import *
+from .topic_catalog import *
+from .columnar import *
+from .async_poller import *
+from .backoff import *
+from .response_table import *
+from .latest_values import *
+from .publisher import *
+from .metrics import *
+from .fake_salpy import *
@@ -0,0 +1,98 @@
+import asyncio
+from .utils import create_logger
+
+"""
+A single asyncio task reading all the topics of a SAL manager.
+
+Used by DDSSubscriberMain.next()/stream()/add_callback() so that an asyncio
+application subscribing to many topics only has one task polling SAL, instead
+of one task per topic.
+"""
+
+__all__ = ['AsyncPoller']
+
+LOGGER = create_logger(name=__name__)
+
+
+class AsyncPoller:
+    """Poll the topics of a SAL manager from one asyncio task.
+
+    A poller is shared by all the subscribers using the same manager in the
+    same event loop, get it with AsyncPoller.get(). Subscribers must provide
+    poll() (returning a sample or None), dispatch(sample) and tsleep. The task
+    starts with the first subscriber and ends when the last one is removed.
+
+    Attributes:
+        manager: The SAL manager the topics are read from.
+        subscribers: List of the subscribers being read.
+        max_samples: Maximum number of samples read from one topic per loop.
+    """
+    _pollers = {}
+
+    def __init__(self, manager, loop, max_samples=100):
+        self.manager = manager
+        self.loop = loop
+        self.max_samples = max_samples
+        self.subscribers = []
+        self.task = None
+        self.log = LOGGER
+
+    @classmethod
+    def get(cls, manager, loop=None):
+        """Return the poller of a manager for the running event loop.
+
+        Must be called from the event loop thread.
+        """
+        loop = loop if loop is not None else asyncio.get_running_loop()
+        key = (id(manager), loop)
+        poller = cls._pollers.get(key)
+        if poller is None:
+            poller = cls._pollers[key] = cls(manager, loop)
+        return poller
+
+    def add(self, subscriber):
+        if subscriber not in self.subscribers:
+            self.subscribers.append(subscriber)
+        if self.task is None or self.task.done():
+            self._pollers[(id(self.manager), self.loop)] = self
+            self.task = self.loop.create_task(self.run())
+
+    def remove(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def poll(self):
+        """Read and dispatch the pending samples of all the topics once.
+
+        Returns
+        -------
+        int
+            Number of samples read.
+        """
+        nread = 0
+        for subscriber in list(self.subscribers):
+            for _ in range(self.max_samples):
+                sample = subscriber.poll()
+                if sample is None:
+                    break
+                subscriber.dispatch(sample)
+                nread += 1
+        return nread
+
+    async def run(self):
+        try:
+            while len(self.subscribers) > 0:
+                try:
+                    nread = self.poll()
+                except Exception:
+                    self.log.exception('Error while polling topics.')
+                    nread = 0
+                if nread == 0:
+                    await asyncio.sleep(min((subscriber.tsleep for subscriber in self.subscribers),
+                                            default=0))
+                else:
+                    # Let the consumers run
+                    await asyncio.sleep(0)
+        finally:
+            if self._pollers.get((id(self.manager), self.loop)) is self:
+                del self._pollers[(id(self.manager), self.loop)]
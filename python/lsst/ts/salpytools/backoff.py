@@ -0,0 +1,55 @@
+__all__ = ['AdaptiveInterval']
+
+
+class AdaptiveInterval:
+    """Polling interval that adapts to the traffic of a topic.
+
+    After a poll that returned data the interval goes back to min_interval.
+    After each poll that returned nothing it is multiplied by factor, up to
+    max_interval. With min_interval == max_interval the interval is fixed.
+
+    Attributes:
+        min_interval: Shortest interval (seconds), used while there is data.
+        max_interval: Longest interval (seconds), reached when idle.
+        factor: Growth of the interval after each empty poll.
+        interval: Current interval.
+        npolls: Number of polls.
+        nempty: Number of polls that returned nothing.
+        nsamples: Number of samples returned by the polls.
+    """
+    def __init__(self, min_interval, max_interval=None, factor=2.):
+        max_interval = min_interval if max_interval is None else max_interval
+        if min_interval < 0 or max_interval < min_interval:
+            raise ValueError('Need 0 <= min_interval <= max_interval, got {} and {}'.format(
+                min_interval, max_interval))
+        if factor < 1:
+            raise ValueError('factor must be >= 1, got {}'.format(factor))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+        self.npolls = 0
+        self.nempty = 0
+        self.nsamples = 0
+
+    def update(self, nread):
+        """Account for a poll that returned nread samples and return the time to wait."""
+        self.npolls += 1
+        if nread > 0:
+            self.nsamples += nread
+            self.interval = self.min_interval
+        else:
+            self.nempty += 1
+            self.interval = min(max(self.interval, 1e-3) * self.factor, self.max_interval)
+        return self.interval
+
+    def reset(self):
+        self.interval = self.min_interval
+
+    def stats(self):
+        return {'interval': self.interval,
+                'min_interval': self.min_interval,
+                'max_interval': self.max_interval,
+                'npolls': self.npolls,
+                'nempty': self.nempty,
+                'nsamples': self.nsamples}
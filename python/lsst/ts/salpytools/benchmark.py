@@ -0,0 +1,291 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from . import salpylib
+from .fake_salpy import FakeSALBus, install_fake_salpy, uninstall_fake_salpy
+
+"""
+Benchmarks of the subscribe, publish and command paths of salpylib.
+
+They run on the in-process fake SALPY backend (see fake_salpy), so they measure
+the overhead of salpylib itself, not of DDS. Run them with
+
+    python -m lsst.ts.salpytools.benchmark --output bench.json
+
+and compare two runs (e.g. before and after an upgrade) with
+
+    python -m lsst.ts.salpytools.benchmark --compare old.json new.json
+"""
+
+__all__ = ['run_benchmarks', 'compare_results']
+
+DEVICE = 'salpytoolsBench'
+
+
+def percentiles(values, quantiles=(50, 90, 99)):
+    """Return {'pQ': value} for the quantiles of a list of values (None if empty)."""
+    values = sorted(values)
+    result = {}
+    for q in quantiles:
+        index = min(len(values) - 1, int(q / 100. * len(values)))
+        result['p{}'.format(q)] = values[index] if values else None
+    result['mean'] = sum(values) / len(values) if values else None
+    result['count'] = len(values)
+    return result
+
+
+def make_schema(ntopics=1, nevents=1, ncommands=1):
+    return {'telemetry': {'topic{}'.format(i): {'value': float, 'position': (float, 3)}
+                          for i in range(ntopics)},
+            'events': {'event{}'.format(i): {'value': float} for i in range(nevents)},
+            'commands': {'command{}'.format(i): {'value': int} for i in range(ncommands)}}
+
+
+class BenchContext:
+    """Context executing the benchmark commands immediately."""
+    subsystem_tag = DEVICE
+
+    def execute_command(self, command, data):
+        return 0, 'Done'
+
+
+def bench_telemetry_throughput(ntopics, nsamples, timeout=30., loss=0.):
+    """Samples per second read by a DDSPoller, with ntopics topics receiving nsamples each.
+
+    Reading stops after timeout seconds, the samples not read by then are
+    reported as lost (loss is the probability of the bus losing each sample).
+    """
+    install_fake_salpy(DEVICE, make_schema(ntopics=ntopics), bus=FakeSALBus(depth=nsamples, loss=loss))
+    sender = salpylib.DDSSend(DEVICE)
+    poller = salpylib.DDSPoller(tsleep=0.001, max_samples=nsamples)
+    subscribers = []
+    try:
+        for i in range(ntopics):
+            subscriber = salpylib.DDSSubscriber(DEVICE, 'topic{}'.format(i), nkeep=10)
+            poller.add_subscriber(subscriber)
+            subscribers.append(subscriber)
+
+        start = time.perf_counter()
+        for i in range(ntopics):
+            sender.publish_many('topic{}'.format(i), ({'value': float(j)} for j in range(nsamples)))
+        publish_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        end = time.monotonic() + timeout
+        nread = 0
+        while nread < ntopics * nsamples and time.monotonic() < end:
+            poller.poll()
+            nread = sum(subscriber.nread for subscriber in subscribers)
+        read_time = time.perf_counter() - start
+    finally:
+        for subscriber in subscribers:
+            subscriber.close()
+        sender.close()
+        uninstall_fake_salpy(DEVICE)
+
+    return {'topics': ntopics,
+            'samples': ntopics * nsamples,
+            'publish_rate': ntopics * nsamples / publish_time,
+            'read_rate': nread / read_time,
+            'lost': ntopics * nsamples - nread}
+
+
+def bench_event_latency(nevents, rate):
+    """Latency (seconds) from logEvent to the callback of a DDSSubscriber thread."""
+    install_fake_salpy(DEVICE, make_schema())
+    sender = salpylib.DDSSend(DEVICE)
+    subscriber = salpylib.DDSSubscriber(DEVICE, 'event0', Stype='Event', tsleep=0.001, drain=True)
+    latencies = []
+    try:
+        subscriber.add_callback(lambda sample: latencies.append(time.time() - sample.private_sndStamp))
+        subscriber.start()
+        sender.publish_many('event0', ({'value': float(i)} for i in range(nevents)), stype='Event', rate=rate)
+        end = time.monotonic() + 5.
+        while len(latencies) < nevents and time.monotonic() < end:
+            time.sleep(0.01)
+    finally:
+        subscriber.close()
+        sender.close()
+        uninstall_fake_salpy(DEVICE)
+
+    return dict(percentiles(latencies), rate=rate, lost=nevents - len(latencies))
+
+
+def bench_command_latency(ncommands):
+    """Latency (seconds) from send_Command to the COMPLETE ack, with DDSCommandDispatcher."""
+    install_fake_salpy(DEVICE, make_schema())
+    dispatcher = salpylib.DDSCommandDispatcher(BenchContext(), ['command0'], tsleep=0.001)
+    dispatcher.start()
+    sender = salpylib.DDSSend(DEVICE, sleeptime=0.001)
+    sender.start()
+    latencies = []
+    try:
+        for i in range(ncommands):
+            start = time.perf_counter()
+            _, (_, ack) = sender.send_Command('command0', value=i, wait_command=True, timeout=5)
+            if len(ack) > 0 and ack[0] == salpylib.SAL__CMD_COMPLETE:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        dispatcher.stop()
+        dispatcher.join()
+        sender.close()
+        uninstall_fake_salpy(DEVICE)
+
+    return dict(percentiles(latencies), failed=ncommands - len(latencies))
+
+
+def bench_idle_cpu(ntopics, duration, multiplex):
+    """CPU time used per second and per topic by idle subscribers.
+
+    With multiplex the topics are read by one DDSPoller thread, otherwise by one
+    DDSSubscriber thread each.
+    """
+    install_fake_salpy(DEVICE, make_schema(ntopics=ntopics))
+    subscribers = []
+    poller = salpylib.DDSPoller(tsleep=0.01) if multiplex else None
+    try:
+        for i in range(ntopics):
+            subscriber = salpylib.DDSSubscriber(DEVICE, 'topic{}'.format(i), tsleep=0.01)
+            subscribers.append(subscriber)
+            if poller is not None:
+                poller.add_subscriber(subscriber)
+            else:
+                subscriber.start()
+        if poller is not None:
+            poller.start()
+        time.sleep(0.1)
+        start_cpu, start = time.process_time(), time.perf_counter()
+        time.sleep(duration)
+        cpu = (time.process_time() - start_cpu) / (time.perf_counter() - start)
+    finally:
+        if poller is not None:
+            poller.stop()
+            poller.join()
+        for subscriber in subscribers:
+            subscriber.close()
+        uninstall_fake_salpy(DEVICE)
+
+    return {'topics': ntopics,
+            'multiplex': multiplex,
+            'cpu_fraction': cpu,
+            'cpu_fraction_per_topic': cpu / ntopics}
+
+
+def bench_subscriber_memory(nsubscribers, nkeep, nsamples):
+    """Memory (bytes) allocated per DDSSubscriber, with nsamples samples received."""
+    install_fake_salpy(DEVICE, make_schema(ntopics=nsubscribers))
+    sender = salpylib.DDSSend(DEVICE)
+    subscribers = []
+    try:
+        tracemalloc.start()
+        start = tracemalloc.take_snapshot()
+        for i in range(nsubscribers):
+            subscribers.append(salpylib.DDSSubscriber(DEVICE, 'topic{}'.format(i), nkeep=nkeep))
+        created = tracemalloc.take_snapshot()
+        for i, subscriber in enumerate(subscribers):
+            sender.publish_many('topic{}'.format(i), ({'value': float(j)} for j in range(nsamples)))
+            subscriber.read_pending()
+        filled = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    finally:
+        for subscriber in subscribers:
+            subscriber.close()
+        sender.close()
+        uninstall_fake_salpy(DEVICE)
+
+    def size(snapshot):
+        return sum(stat.size_diff for stat in snapshot.compare_to(start, 'filename'))
+
+    return {'subscribers': nsubscribers,
+            'nkeep': nkeep,
+            'bytes_per_subscriber': size(created) / nsubscribers,
+            'bytes_per_subscriber_with_history': size(filled) / nsubscribers}
+
+
+def run_benchmarks(quick=False):
+    """Run all the benchmarks.
+
+    Parameters
+    ----------
+    quick: bool
+        Smaller sizes and durations, for a smoke test.
+
+    Returns
+    -------
+    dict
+        The results, with the environment they were obtained in.
+    """
+    scale = 0.1 if quick else 1.
+    topic_counts = (1, 10) if quick else (1, 10, 50)
+    results = {
+        'telemetry_throughput': [bench_telemetry_throughput(ntopics, max(10, int(20000 * scale / ntopics)))
+                                 for ntopics in topic_counts],
+        'event_latency': bench_event_latency(max(10, int(2000 * scale)), rate=1000.),
+        'command_latency': bench_command_latency(max(10, int(500 * scale))),
+        'idle_cpu': [bench_idle_cpu(ntopics, 0.2 if quick else 2., multiplex)
+                     for ntopics in topic_counts[-1:] for multiplex in (False, True)],
+        'subscriber_memory': bench_subscriber_memory(10 if quick else 50, 100, 100),
+    }
+    try:
+        from .version import __version__
+    except ImportError:
+        __version__ = 'unknown'
+    return {'environment': {'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'salpytools': __version__,
+                            'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def _flatten(value, prefix=''):
+    """Flatten nested results into {'a.b.0.c': number}."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        flat.update(_flatten(item, '{}.{}'.format(prefix, key) if prefix else str(key)))
+    return flat
+
+
+def compare_results(old, new):
+    """Return {metric: (old, new, relative change)} for the metrics in both results."""
+    old, new = _flatten(old['results']), _flatten(new['results'])
+    return {key: (old[key], new[key], (new[key] - old[key]) / old[key] if old[key] else None)
+            for key in old if key in new}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of salpytools on a fake SALPY backend.')
+    parser.add_argument('--output', help='Write the results (JSON) to this file.')
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes, for a smoke test.')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Compare two result files instead of running the benchmarks.')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            comparison = compare_results(json.load(old), json.load(new))
+        for key, (old_value, new_value, change) in sorted(comparison.items()):
+            change = '{:+.1%}'.format(change) if change is not None else 'n/a'
+            print('{:60s} {:>12.4g} {:>12.4g} {:>8s}'.format(key, old_value, new_value, change))
+        return 0
+
+    results = run_benchmarks(quick=args.quick)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import time
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Columnar storage of telemetry samples in NumPy arrays.
+
+Each numeric scalar field of a topic is stored in its own column, and each
+fixed-length array field in a 2-D column, so the last N samples of a field
+are available as an array without any Python-level loop.
+
+NumPy is an optional dependency, only needed if ColumnarBuffer is used.
+"""
+
+__all__ = ['ColumnarBuffer']
+
+
+class ColumnarBuffer:
+    """Fixed-capacity columnar ring buffer for the samples of a topic.
+
+    Every sample is written twice, at i and i + capacity, so the most recent
+    samples are always contiguous in memory and to_arrays()/window() copy them
+    with a single slice per field. The arrays returned are copies, they are
+    not modified by later appends.
+
+    String fields are not stored. A column named rcv_time holds the time at
+    which each sample was received, on the time.monotonic() clock (the one of
+    DDSSubscriber.age() and SampleTime.received).
+
+    Attributes:
+        schema: TopicSchema of the topic.
+        capacity: Number of samples kept.
+        fields: Names of the stored fields.
+        count: Total number of samples appended.
+    """
+    def __init__(self, schema, capacity):
+        if np is None:
+            raise ImportError('ColumnarBuffer requires numpy.')
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1, got {}'.format(capacity))
+        self.schema = schema
+        self.capacity = capacity
+        self.count = 0
+        self._lock = threading.Lock()
+
+        self._index = []  # Index of each stored field in the samples
+        self._columns = {}
+        for i, (field, ftype, length) in enumerate(zip(schema.fields, schema.types, schema.lengths)):
+            if ftype not in (int, float, bool):
+                continue
+            shape = (2 * capacity, ) if length is None else (2 * capacity, length)
+            self._columns[field] = np.zeros(shape, dtype=ftype)
+            self._index.append((i, self._columns[field]))
+        self._columns['rcv_time'] = np.zeros(2 * capacity, dtype=float)
+        self.fields = tuple(self._columns)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, sample, rcv_time=None):
+        """Add a sample (a TopicSample or a tuple ordered as schema.fields).
+
+        rcv_time defaults to time.monotonic() (now).
+        """
+        rcv_time = time.monotonic() if rcv_time is None else rcv_time
+        with self._lock:
+            i = self.count % self.capacity
+            j = i + self.capacity
+            for index, column in self._index:
+                column[i] = column[j] = sample[index]
+            self._columns['rcv_time'][i] = self._columns['rcv_time'][j] = rcv_time
+            self.count += 1
+
+    def to_arrays(self, last=None):
+        """Return a dictionary {field: array} with the last samples, oldest first.
+
+        Parameters
+        ----------
+        last: int, opt
+            Number of samples to return. Default: all the samples in the buffer.
+
+        Returns
+        -------
+        dict
+            Copies of the last samples, one array per field (plus rcv_time).
+        """
+        with self._lock:
+            start, end = self._bounds(last)
+            return {field: column[start:end].copy() for field, column in self._columns.items()}
+
+    def window(self, t0, t1, field='rcv_time'):
+        """Return the samples with t0 <= field < t1, see to_arrays().
+
+        The field used for the selection must be increasing (e.g. rcv_time).
+        """
+        with self._lock:
+            start, end = self._bounds()
+            first, stop = np.searchsorted(self._columns[field][start:end], [t0, t1], side='left')
+            return {name: column[start + first:start + stop].copy() for name, column in self._columns.items()}
+
+    def _bounds(self, last=None):
+        """Return the slice (start, end) of the columns holding the last samples, call with _lock held."""
+        size = len(self)
+        last = size if last is None else max(0, min(last, size))
+        end = (self.count - 1) % self.capacity + self.capacity + 1 if self.count > 0 else 0
+        return end - last, end
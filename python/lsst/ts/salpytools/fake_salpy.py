@@ -0,0 +1,372 @@
+import sys
+import time
+import types
+import random
+import threading
+import collections
+
+"""
+An in-process, pure-Python stand-in for the SALPY_<device> libraries generated by ts_sal,
+to test and benchmark salpylib without a DDS build.
+
+It implements the subset of the SALPY API used by salpylib (SAL_<device> managers, topic data
+classes, salProcessor/salEvent/salTelemetrySub/salTelemetryPub, getNextSample_*, putSample_*,
+getEvent_*, logEvent_*, issueCommand_*, acceptCommand_*, ackCommand_*, getResponse_*,
+waitForCompletion_*) on top of in-memory queues, with a configurable latency and loss.
+
+A module is generated from a small schema:
+
+    schema = {'telemetry': {'bulkCloud': {'bulkCloud': float, 'timestamp': float}},
+              'events': {'target': {'targetId': int, 'ra': float, 'dec': float}},
+              'commands': {'enable': {'value': bool}}}
+    install_fake_salpy('scheduler', schema)
+    import SALPY_scheduler
+
+Array fields are given as (type, length), e.g. {'position': (float, 3)}.
+"""
+
+__all__ = ['FakeSALBus', 'make_fake_salpy', 'install_fake_salpy', 'uninstall_fake_salpy']
+
+SAL__OK = 0
+SAL__NO_UPDATES = -100
+SAL__CMD_ACK = 300
+SAL__CMD_INPROGRESS = 301
+SAL__CMD_NOACK = -301
+SAL__CMD_TIMEOUT = -304
+
+# Fields SAL adds to every topic
+PRIVATE_FIELDS = {'private_revCode': str,
+                  'private_sndStamp': float,
+                  'private_rcvStamp': float,
+                  'private_seqNum': int,
+                  'private_origin': int,
+                  'private_host': int}
+
+ACK_FIELDS = {'ack': int, 'error': int, 'result': str}
+
+
+class FakeSALBus:
+    """The "network": routes samples between the managers of a fake SALPY module.
+
+    Attributes:
+        latency: Delay (seconds) before a sample is visible to readers.
+        loss: Probability that a sample is dropped for a given reader.
+        depth: History depth of each reader queue (oldest samples are lost).
+    """
+    def __init__(self, latency=0., loss=0., depth=1000, seed=None):
+        self.latency = latency
+        self.loss = loss
+        self.depth = depth
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.readers = collections.defaultdict(list)  # topic -> [deque]
+        self.processors = collections.defaultdict(list)  # command topic -> [deque]
+        self.seq_num = _counter()
+        self.cmd_seq_num = _counter()
+        self.sent = 0
+        self.dropped = 0
+
+    def add_reader(self, topic, processor=False):
+        queue = collections.deque(maxlen=self.depth)
+        with self.lock:
+            (self.processors if processor else self.readers)[topic].append(queue)
+        return queue
+
+    def publish(self, topic, message, processor=False):
+        deliver_at = time.monotonic() + self.latency
+        with self.lock:
+            self.sent += 1
+            for queue in (self.processors if processor else self.readers)[topic]:
+                if self.loss and self.random.random() < self.loss:
+                    self.dropped += 1
+                    continue
+                queue.append((deliver_at, message))
+
+    def receive(self, queue):
+        """Pop the next message that is due, or None."""
+        with self.lock:
+            if len(queue) == 0 or queue[0][0] > time.monotonic():
+                return None
+            return queue.popleft()[1]
+
+    def lose(self):
+        """Return True if a message (e.g. an ack) is lost, counting it."""
+        if not self.loss:
+            return False
+        with self.lock:
+            if self.random.random() < self.loss:
+                self.dropped += 1
+                return True
+        return False
+
+
+def _counter():
+    """Return a thread-safe counter function, starting at 1."""
+    lock = threading.Lock()
+    state = [0]
+
+    def _next():
+        with lock:
+            state[0] += 1
+            return state[0]
+    return _next
+
+
+def _default(ftype, length=None):
+    value = ftype()
+    if length is None:
+        return value
+    return [value] * length
+
+
+def _make_data_class(name, fields):
+    """Create a topic data class with default-initialized attributes."""
+    layout = {}
+    for field, ftype in fields.items():
+        if isinstance(ftype, tuple):
+            layout[field] = ftype
+        else:
+            layout[field] = (ftype, None)
+
+    def __init__(self):
+        for field, (ftype, length) in layout.items():
+            setattr(self, field, _default(ftype, length))
+
+    def __repr__(self):
+        return '{}({})'.format(name, ', '.join('{}={!r}'.format(field, getattr(self, field))
+                                               for field in layout))
+
+    return type(name, (object,), {'__init__': __init__, '__repr__': __repr__,
+                                  '__slots__': tuple(layout), '__fields__': layout})
+
+
+def _copy_into(source, target):
+    for field in target.__fields__:
+        value = getattr(source, field)
+        setattr(target, field, list(value) if isinstance(value, list) else value)
+
+
+def _snapshot(data):
+    return {field: (list(value) if isinstance(value, list) else value)
+            for field, value in ((field, getattr(data, field)) for field in data.__fields__)}
+
+
+def _restore(message, target):
+    for field, value in message.items():
+        setattr(target, field, list(value) if isinstance(value, list) else value)
+
+
+def make_fake_salpy(device, schema, indexed=False, bus=None):
+    """Generate a fake SALPY_<device> module.
+
+    Parameters
+    ----------
+    device: str
+        Name of the component (e.g. scheduler).
+    schema: dict
+        {'telemetry': {name: {field: type}}, 'events': {...}, 'commands': {...}}
+    indexed: bool, opt
+        If True SAL_<device> requires a device id, otherwise passing one raises TypeError (as SALPY).
+    bus: FakeSALBus, opt
+        Bus used to route the samples, a new one is created if not given.
+
+    Returns
+    -------
+    module
+    """
+    bus = bus if bus is not None else FakeSALBus()
+    module = types.ModuleType('SALPY_{}'.format(device))
+    module.bus = bus
+    module.schema = schema
+    module.SAL__OK = SAL__OK
+    module.SAL__NO_UPDATES = SAL__NO_UPDATES
+    module.SAL__CMD_NOACK = SAL__CMD_NOACK
+
+    telemetry = schema.get('telemetry', {})
+    events = schema.get('events', {})
+    commands = schema.get('commands', {})
+
+    ack_class = _make_data_class('{}_ackcmdC'.format(device), dict(ACK_FIELDS, cmdSeqNum=int))
+    setattr(module, ack_class.__name__, ack_class)
+    for names, prefix in ((telemetry, '{}_'), (events, '{}_logevent_'), (commands, '{}_command_')):
+        for name, fields in names.items():
+            data_class = _make_data_class((prefix + '{}C').format(device, name),
+                                          dict(fields, **PRIVATE_FIELDS))
+            setattr(module, data_class.__name__, data_class)
+
+    manager_ids = _counter()
+
+    class Manager:
+
+        def __init__(self, *args):
+            if indexed and len(args) != 1:
+                raise TypeError('SAL_{}() takes exactly one argument'.format(device))
+            if not indexed and len(args) != 0:
+                raise TypeError('SAL_{}() takes no arguments'.format(device))
+            self.device_id = args[0] if indexed else 0
+            self.origin = manager_ids()
+            self.readers = {}
+            self.processors = {}
+            self.responses = collections.defaultdict(collections.deque)
+            self.ack_lock = threading.Lock()
+            self.shutdown = False
+
+        def _stamp(self, data):
+            data.private_sndStamp = time.time()
+            data.private_seqNum = bus.seq_num()
+            data.private_origin = self.origin
+
+        def _read(self, topic, data):
+            queue = self.readers.get(topic)
+            if queue is None:
+                return SAL__NO_UPDATES
+            message = bus.receive(queue)
+            if message is None:
+                return SAL__NO_UPDATES
+            _restore(message, data)
+            data.private_rcvStamp = time.time()
+            return SAL__OK
+
+        def salTelemetrySub(self, topic):
+            self.readers.setdefault(topic, bus.add_reader(topic))
+            return SAL__OK
+
+        def salTelemetryPub(self, topic):
+            return SAL__OK
+
+        def salEvent(self, topic):
+            self.readers.setdefault(topic, bus.add_reader(topic))
+            return SAL__OK
+
+        def salProcessor(self, topic):
+            self.processors.setdefault(topic, bus.add_reader(topic, processor=True))
+            return SAL__OK
+
+        def salCommand(self, topic):
+            return SAL__OK
+
+        def salShutdown(self):
+            self.shutdown = True
+
+    def add_telemetry(name):
+        topic = '{}_{}'.format(device, name)
+
+        def putSample(self, data):
+            self._stamp(data)
+            bus.publish(topic, _snapshot(data))
+            return SAL__OK
+
+        def getNextSample(self, data):
+            return self._read(topic, data)
+
+        setattr(Manager, 'putSample_{}'.format(name), putSample)
+        setattr(Manager, 'getNextSample_{}'.format(name), getNextSample)
+        setattr(Manager, 'getSample_{}'.format(name), getNextSample)
+
+    def add_event(name):
+        topic = '{}_logevent_{}'.format(device, name)
+
+        def logEvent(self, data, priority=1):
+            self._stamp(data)
+            bus.publish(topic, _snapshot(data))
+            return SAL__OK
+
+        def getEvent(self, data):
+            return self._read(topic, data)
+
+        setattr(Manager, 'logEvent_{}'.format(name), logEvent)
+        setattr(Manager, 'getEvent_{}'.format(name), getEvent)
+
+    def add_command(name):
+        topic = '{}_command_{}'.format(device, name)
+
+        def issueCommand(self, data):
+            self._stamp(data)
+            cmd_id = bus.cmd_seq_num()
+            bus.publish(topic, (cmd_id, self, _snapshot(data)), processor=True)
+            return cmd_id
+
+        def acceptCommand(self, data):
+            queue = self.processors.get(topic)
+            if queue is None:
+                return 0
+            message = bus.receive(queue)
+            if message is None:
+                return 0
+            cmd_id, issuer, fields = message
+            _restore(fields, data)
+            data.private_rcvStamp = time.time()
+            self.processors.setdefault((topic, 'issuers'), {})[cmd_id] = issuer
+            return cmd_id
+
+        def ackCommand(self, cmd_id, ack, error, result):
+            issuers = self.processors.get((topic, 'issuers'), {})
+            if ack in (SAL__CMD_ACK, SAL__CMD_INPROGRESS):
+                issuer = issuers.get(cmd_id)
+            else:
+                # The final ack, forget the command
+                issuer = issuers.pop(cmd_id, None)
+            if issuer is None:
+                return SAL__OK
+            if bus.lose():
+                return SAL__OK
+            with issuer.ack_lock:
+                issuer.responses[topic].append((time.monotonic() + bus.latency,
+                                                (cmd_id, ack, error, result)))
+            return SAL__OK
+
+        def getResponse(self, data):
+            with self.ack_lock:
+                message = bus.receive(self.responses[topic])
+            if message is None:
+                return SAL__CMD_NOACK
+            cmd_id, data.ack, data.error, data.result = message
+            data.cmdSeqNum = cmd_id
+            return cmd_id
+
+        def waitForCompletion(self, cmd_id, timeout):
+            end = time.monotonic() + timeout
+            ack = self.ack_class()
+            while time.monotonic() < end:
+                if getResponse(self, ack) == cmd_id and ack.ack not in (SAL__CMD_ACK, SAL__CMD_INPROGRESS):
+                    return ack.ack
+                time.sleep(0.001)
+            return SAL__CMD_TIMEOUT
+
+        setattr(Manager, 'issueCommand_{}'.format(name), issueCommand)
+        setattr(Manager, 'acceptCommand_{}'.format(name), acceptCommand)
+        setattr(Manager, 'ackCommand_{}'.format(name), ackCommand)
+        setattr(Manager, 'getResponse_{}'.format(name), getResponse)
+        setattr(Manager, 'waitForCompletion_{}'.format(name), waitForCompletion)
+
+    for name in telemetry:
+        add_telemetry(name)
+    for name in events:
+        add_event(name)
+    for name in commands:
+        add_command(name)
+
+    Manager.ack_class = ack_class
+    Manager.__name__ = 'SAL_{}'.format(device)
+    Manager.__qualname__ = Manager.__name__
+    setattr(module, Manager.__name__, Manager)
+    return module
+
+
+def install_fake_salpy(device, schema, **kwargs):
+    """Generate a fake SALPY_<device> module and register it in sys.modules.
+
+    Other arguments are passed to make_fake_salpy.
+
+    Returns
+    -------
+    module
+    """
+    module = make_fake_salpy(device, schema, **kwargs)
+    sys.modules[module.__name__] = module
+    return module
+
+
+def uninstall_fake_salpy(device):
+    """Remove a SALPY_<device> module installed with install_fake_salpy."""
+    sys.modules.pop('SALPY_{}'.format(device), None)
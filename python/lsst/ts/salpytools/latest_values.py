@@ -0,0 +1,173 @@
+import time
+import threading
+import collections
+
+"""
+Device-wide cache of the latest value of every field of a set of topics.
+
+The cache is fed with the samples of the topics (DDSSubscriberContainer does it
+for all the topics it reads) and keeps a versioned snapshot per topic. The
+version is a counter shared by all the topics of the cache, incremented every
+time a sample changes at least one field, so a consumer (a GUI, a bridge to a
+database, ...) only has to remember the version it last saw and ask for what
+changed since with changed_since(version).
+
+A deadband can be given for numeric fields, a new value then only counts as a
+change if it differs by more than the deadband from the last value reported.
+"""
+
+__all__ = ['LatestValueCache', 'TopicSnapshot']
+
+# Snapshot of a topic: version of its last change, {field: value}, and when it was stored (time.monotonic())
+TopicSnapshot = collections.namedtuple('TopicSnapshot', ['version', 'values', 'time'])
+
+
+class LatestValueCache:
+    """Latest values of the fields of many topics, with change detection.
+
+    The values of a snapshot are the last values reported: a field whose
+    variations stay within its deadband keeps the value it had when it last
+    changed. Snapshots are never modified once stored, they can be kept and
+    read from any thread.
+
+    Topics are identified by their full name (e.g. scheduler_logevent_target),
+    which is unique across the telemetry, events and commands of a device.
+
+    Parameters
+    ----------
+    deadbands: dict, opt
+        {topic: {field: deadband}}, see set_deadband.
+    ignore_private: bool, opt
+        Do not count changes of the private_* fields (e.g. private_sndStamp,
+        different in every sample) as changes. They are still updated with
+        the others when a sample changes. Default: True.
+
+    Attributes:
+        version: Version of the last change (0 if none).
+        nupdates: Number of samples given to update().
+        nchanges: Number of samples that changed at least one field.
+    """
+    def __init__(self, deadbands=None, ignore_private=True):
+        self.ignore_private = ignore_private
+        self.version = 0
+        self.nupdates = 0
+        self.nchanges = 0
+        self._snapshots = {}  # topic: TopicSnapshot
+        self._field_versions = {}  # topic: {field: version of its last change}
+        self._deadbands = {}  # topic: {field: deadband}
+        self._compared = {}  # (topic, sample class): ((index, field, deadband), ...)
+        self._lock = threading.Lock()
+        for topic, fields in (deadbands or {}).items():
+            for field, deadband in fields.items():
+                self.set_deadband(topic, field, deadband)
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def __contains__(self, topic):
+        return topic in self._snapshots
+
+    def topics(self):
+        return list(self._snapshots)
+
+    def set_deadband(self, topic, field, deadband):
+        """Only report a change of topic.field larger than deadband.
+
+        For array fields a change of any element larger than deadband is a
+        change. A deadband of None (or 0) reports every change.
+        """
+        if deadband is not None and deadband < 0:
+            raise ValueError('deadband must be >= 0, got {}'.format(deadband))
+        with self._lock:
+            self._deadbands.setdefault(topic, {})[field] = deadband or None
+            self._compared = {key: value for key, value in self._compared.items() if key[0] != topic}
+
+    def _fields(self, topic, sample):
+        """Return ((index, field, deadband), ...) for the fields of sample that are compared."""
+        key = (topic, type(sample))
+        compared = self._compared.get(key)
+        if compared is None:
+            deadbands = self._deadbands.get(topic, {})
+            compared = self._compared[key] = tuple(
+                (i, field, deadbands.get(field)) for i, field in enumerate(sample._fields)
+                if not (self.ignore_private and field.startswith('private_')))
+        return compared
+
+    def update(self, topic, sample):
+        """Store a new sample (a TopicSample) of topic.
+
+        Returns
+        -------
+        list
+            Names of the fields that changed (empty if none did).
+        """
+        with self._lock:
+            self.nupdates += 1
+            previous = self._snapshots.get(topic)
+            if previous is None:
+                changed = [field for _, field, _ in self._fields(topic, sample)]
+                values = sample._asdict()
+            else:
+                old = previous.values
+                changed = [field for i, field, deadband in self._fields(topic, sample)
+                           if _changed(old[field], sample[i], deadband)]
+                if not changed:
+                    return changed
+                # Fields within their deadband keep the value last reported
+                values = dict(zip(sample._fields, sample))
+                for _, field, deadband in self._fields(topic, sample):
+                    if deadband is not None and field not in changed:
+                        values[field] = old[field]
+            self.version += 1
+            self.nchanges += 1
+            self._snapshots[topic] = TopicSnapshot(self.version, values, time.monotonic())
+            field_versions = self._field_versions.setdefault(topic, {})
+            for field in changed:
+                field_versions[field] = self.version
+            return changed
+
+    def get(self, topic, default=None):
+        """Return the TopicSnapshot of topic, default if no sample was stored."""
+        return self._snapshots.get(topic, default)
+
+    def snapshot(self):
+        """Return the current version and {topic: TopicSnapshot} for all the topics."""
+        with self._lock:
+            return self.version, dict(self._snapshots)
+
+    def changed_since(self, version):
+        """Return the fields that changed after version.
+
+        Returns
+        -------
+        int, dict
+            The current version and {topic: {field: value}} with only the
+            topics and fields that changed. Pass the former to the next call
+            to get only the new changes (0 gives all the compared fields).
+        """
+        changes = {}
+        with self._lock:
+            for topic, snapshot in self._snapshots.items():
+                if snapshot.version <= version:
+                    continue
+                changes[topic] = {field: snapshot.values[field]
+                                  for field, field_version in self._field_versions[topic].items()
+                                  if field_version > version}
+            return self.version, changes
+
+    def stats(self):
+        return {'topics': len(self._snapshots),
+                'version': self.version,
+                'updates': self.nupdates,
+                'changes': self.nchanges}
+
+
+def _changed(old, new, deadband):
+    if deadband is None:
+        return old != new
+    try:
+        if isinstance(new, tuple):
+            return len(old) != len(new) or any(abs(n - o) > deadband for o, n in zip(old, new))
+        return abs(new - old) > deadband
+    except TypeError:
+        return old != new
@@ -0,0 +1,205 @@
+import threading
+from .utils import create_logger, load_SALPYlib
+
+"""
+A process-wide pool of SAL managers.
+
+Creating a SAL_<device>() manager creates a new DDS participant, which is by
+far the most expensive thing the classes in salpylib do. The pool hands out
+shared, reference-counted managers keyed by (device, device_id) and keeps
+track of the salProcessor/salEvent/salTelemetrySub/... registrations already
+done on each of them, so they are issued only once.
+
+A reader (e.g. getNextSample_<topic>, acceptCommand_<cmd>) consumes the samples
+it returns, so two objects reading the same topic from the same manager would
+steal samples from each other. Objects that read a topic therefore `claim` it
+when acquiring a manager; the pool only shares a manager between objects that
+claim different topics and creates a new one otherwise.
+"""
+
+__all__ = ['SharedManager', 'SALManagerPool', 'MANAGER_POOL', 'get_manager', 'release_manager']
+
+LOGGER = create_logger(name=__name__)
+
+
+class SharedManager:
+    """Proxy to a SAL_<device> manager shared by several objects.
+
+    Any attribute not defined here (getNextSample_*, putSample_*,
+    issueCommand_*, ...) is forwarded to the underlying manager. The
+    registration methods are idempotent.
+
+    Attributes:
+        device: Name of the SALPY component (e.g. scheduler).
+        device_id: Index used to create the manager (None if not indexed).
+        SALPY_lib: The SALPY_<device> module.
+        mgr: The underlying SAL_<device> manager.
+        refcount: Number of objects currently holding this manager.
+        claims: Topics with a reader owned by one of the holders.
+        registrations: Set of (method, topic) already issued on mgr.
+    """
+    def __init__(self, device, device_id, SALPY_lib, mgr):
+        self.device = device
+        self.device_id = device_id
+        self.SALPY_lib = SALPY_lib
+        self.mgr = mgr
+        self.refcount = 0
+        self.claims = set()
+        self.registrations = set()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, item):
+        # Only called when item is not found the usual way
+        return getattr(self.mgr, item)
+
+    def __repr__(self):
+        return 'SharedManager({}, device_id={}, refcount={})'.format(self.device,
+                                                                     self.device_id,
+                                                                     self.refcount)
+
+    def register(self, method, topic):
+        """Call mgr.<method>(topic) unless it was already done.
+
+        Parameters
+        ----------
+        method: str
+            One of salProcessor, salEvent, salTelemetrySub, salTelemetryPub, salCommand.
+        topic: str
+            Full topic name (e.g. scheduler_logevent_target).
+
+        Returns
+        -------
+        bool
+            True if the registration was issued, False if it was already done.
+        """
+        key = (method, topic)
+        with self._lock:
+            if key in self.registrations:
+                return False
+            getattr(self.mgr, method)(topic)
+            self.registrations.add(key)
+        return True
+
+    def is_registered(self, method, topic):
+        return (method, topic) in self.registrations
+
+    def salProcessor(self, topic):
+        return self.register('salProcessor', topic)
+
+    def salCommand(self, topic):
+        return self.register('salCommand', topic)
+
+    def salEvent(self, topic):
+        return self.register('salEvent', topic)
+
+    def salTelemetrySub(self, topic):
+        return self.register('salTelemetrySub', topic)
+
+    def salTelemetryPub(self, topic):
+        return self.register('salTelemetryPub', topic)
+
+
+class SALManagerPool:
+    """Registry of SharedManager keyed by (device, device_id)."""
+    def __init__(self):
+        self._managers = {}
+        self._lock = threading.Lock()
+        self.log = LOGGER
+
+    def acquire(self, device, device_id=None, claim=None):
+        """Get a shared manager for a device.
+
+        Parameters
+        ----------
+        device: str
+            Name of the SALPY component (e.g. scheduler for SALPY_scheduler).
+        device_id: int, opt
+            Index of the component. If the component is not indexed we log an
+            error and fall back to a non-indexed manager.
+        claim: str, opt
+            Full name of a topic the caller will read from. The returned
+            manager is guaranteed not to be shared with another holder that
+            claimed the same topic.
+
+        Returns
+        -------
+        SharedManager
+        """
+        with self._lock:
+            manager = self._find(device, device_id, claim)
+            if manager is None:
+                created = self._create(device, device_id)
+                # If we fell back to a non-indexed manager, there may already be one we can use
+                if created.device_id != device_id:
+                    manager = self._find(device, created.device_id, claim)
+                if manager is None:
+                    manager = created
+                    self._managers.setdefault((device, manager.device_id), []).append(manager)
+            manager.refcount += 1
+            if claim is not None:
+                manager.claims.add(claim)
+        return manager
+
+    def release(self, manager, claim=None):
+        """Give back a manager obtained with acquire().
+
+        The pool drops its reference to the manager once no one holds it.
+        """
+        with self._lock:
+            if claim is not None:
+                manager.claims.discard(claim)
+            manager.refcount -= 1
+            if manager.refcount > 0:
+                return
+            managers = self._managers.get((manager.device, manager.device_id), [])
+            if manager in managers:
+                managers.remove(manager)
+            if len(managers) == 0:
+                self._managers.pop((manager.device, manager.device_id), None)
+
+    def managers(self, device=None):
+        """List the managers currently in the pool."""
+        with self._lock:
+            return [manager for (_device, _), managers in self._managers.items()
+                    for manager in managers if device is None or _device == device]
+
+    def __len__(self):
+        return len(self.managers())
+
+    def _find(self, device, device_id, claim):
+        for manager in self._managers.get((device, device_id), []):
+            if claim is None or claim not in manager.claims:
+                return manager
+        return None
+
+    def _create(self, device, device_id):
+        SALPY_lib = load_SALPYlib(device)
+        sal_class = getattr(SALPY_lib, 'SAL_{}'.format(device))
+        if device_id is None:
+            mgr = sal_class()
+        else:
+            try:
+                mgr = sal_class(device_id)
+            except TypeError:
+                self.log.error('Could not initialize component %s '
+                               'with device id %s. Trying with no id.', device, device_id)
+                device_id = None
+                mgr = sal_class()
+        self.log.debug('Created SAL manager for %s (device_id=%s)', device, device_id)
+        return SharedManager(device, device_id, SALPY_lib, mgr)
+
+
+MANAGER_POOL = SALManagerPool()
+
+
+def get_manager(device, device_id=None, claim=None):
+    """Acquire a shared manager from the process-wide pool.
+
+    See SALManagerPool.acquire.
+    """
+    return MANAGER_POOL.acquire(device, device_id, claim)
+
+
+def release_manager(manager, claim=None):
+    """Release a manager obtained with get_manager()."""
+    MANAGER_POOL.release(manager, claim)
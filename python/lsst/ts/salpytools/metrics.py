@@ -0,0 +1,241 @@
+import json
+import bisect
+import weakref
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .utils import create_logger
+
+"""
+Low-overhead instrumentation of the salpylib readers, writers and controllers.
+
+Every DDSSubscriber, DDSSubscriberMain, DDSController, DDSSend and
+TopicPublisher keeps counters and LatencyHistograms, returned by its stats()
+method, and registers itself in REGISTRY (only a weak reference is kept). The
+registry renders the statistics of all the live objects as JSON or in the
+Prometheus text format, and start_metrics_server() serves them over HTTP.
+"""
+
+__all__ = ['LatencyHistogram', 'MetricsRegistry', 'REGISTRY', 'start_metrics_server']
+
+LOGGER = create_logger(name=__name__)
+
+
+class LatencyHistogram:
+    """Histogram of latencies (in seconds) with fixed buckets.
+
+    Adding a value is O(log(number of buckets)) and the memory used does not
+    depend on the number of values. Percentiles are estimated from the buckets
+    (upper edge of the bucket holding the percentile).
+
+    Attributes:
+        buckets: Upper edges of the buckets, the last bucket holds larger values.
+        counts: Number of values in each bucket (len(buckets) + 1 items).
+        count: Number of values.
+        total: Sum of the values.
+        min: Smallest value (None if empty).
+        max: Largest value (None if empty).
+    """
+    DEFAULT_BUCKETS = (1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2,
+                       0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60.)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(sorted(buckets if buckets is not None else self.DEFAULT_BUCKETS))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.
+            self.min = None
+            self.max = None
+
+    def add(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0 <= q <= 100), None if empty."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = q / 100. * self.count
+            cumulative = 0
+            for i, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= rank and count > 0:
+                    return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+            return self.max
+
+    def stats(self):
+        """Return a dictionary with count, sum, mean, min, max, p50, p90, p99 and the bucket counts."""
+        return {'count': self.count,
+                'sum': self.total,
+                'mean': self.total / self.count if self.count > 0 else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'buckets': dict(zip(self.buckets + (float('inf'), ), self.counts))}
+
+
+class MetricsRegistry:
+    """The instrumented objects of the process, see the module documentation.
+
+    Objects are registered with a kind (e.g. subscriber) and labels (e.g.
+    device and topic) and must have a stats() method returning a dictionary,
+    possibly nested, of numbers. Statistics from a LatencyHistogram (with a
+    buckets entry) are exported as Prometheus histograms, the entries named
+    in counters (totals that only increase) as Prometheus counters (with a
+    _total suffix) and all the other numbers as gauges.
+    """
+    # Names of the stats() entries of salpylib that are counters
+    COUNTERS = frozenset(['read', 'dropped', 'sent', 'commands', 'acks', 'accepted', 'rejected', 'completed',
+                          'failed', 'evicted', 'npolls', 'nempty', 'nsamples', 'updates', 'changes'])
+
+    def __init__(self, counters=None):
+        self.counters = frozenset(counters) if counters is not None else self.COUNTERS
+        self._objects = OrderedDict()  # id: (weakref, kind, labels)
+        self._lock = threading.Lock()
+
+    def register(self, obj, kind, **labels):
+        key = id(obj)
+
+        def forget(_, key=key):
+            with self._lock:
+                entry = self._objects.get(key)
+                if entry is not None and entry[0]() is None:
+                    del self._objects[key]
+
+        with self._lock:
+            self._objects[key] = (weakref.ref(obj, forget), kind, labels)
+
+    def unregister(self, obj):
+        with self._lock:
+            self._objects.pop(id(obj), None)
+
+    def __len__(self):
+        return len(self._objects)
+
+    def collect(self):
+        """Return a list of {'kind': ..., 'labels': {...}, 'stats': {...}} for the live objects.
+
+        Objects whose stats() raises are logged and left out.
+        """
+        with self._lock:
+            entries = list(self._objects.values())
+        collected = []
+        for ref, kind, labels in entries:
+            obj = ref()
+            if obj is None:
+                continue
+            try:
+                stats = obj.stats()
+            except Exception:
+                LOGGER.exception('Could not get the statistics of %s %s', kind, labels)
+                continue
+            collected.append({'kind': kind, 'labels': labels, 'stats': stats})
+        return collected
+
+    def to_json(self):
+        return json.dumps(self.collect(), default=str)
+
+    def to_prometheus(self, prefix='salpytools'):
+        """Return the statistics in the Prometheus text exposition format."""
+        metrics = OrderedDict()  # name: (type, [lines])
+        for entry in self.collect():
+            labels = ','.join('{}="{}"'.format(key, _escape(value)) for key, value in entry['labels'].items())
+            self._add(metrics, '{}_{}'.format(prefix, entry['kind']), entry['stats'], labels)
+        lines = []
+        for name, (mtype, samples) in metrics.items():
+            lines.append('# TYPE {} {}'.format(name, mtype))
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metrics, name, value, labels, key=None):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)) and key in self.counters:
+            name += '_total'
+            metrics.setdefault(name, ('counter', []))[1].append('{}{{{}}} {}'.format(name, labels, value))
+        elif isinstance(value, (int, float)):
+            metrics.setdefault(name, ('gauge', []))[1].append('{}{{{}}} {}'.format(name, labels, value))
+        elif isinstance(value, dict) and isinstance(value.get('buckets'), dict):
+            samples = metrics.setdefault(name, ('histogram', []))[1]
+            cumulative = 0
+            for edge, count in value['buckets'].items():
+                cumulative += count
+                edge = '+Inf' if edge == float('inf') else repr(float(edge))
+                bucket_labels = _join(labels, 'le="{}"'.format(edge))
+                samples.append('{}_bucket{{{}}} {}'.format(name, bucket_labels, cumulative))
+            samples.append('{}_sum{{{}}} {}'.format(name, labels, value.get('sum', 0.)))
+            samples.append('{}_count{{{}}} {}'.format(name, labels, value.get('count', 0)))
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                self._add(metrics, '{}_{}'.format(name, key), item, labels, key)
+
+
+def _escape(value):
+    return str('' if value is None else value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _join(labels, label):
+    return '{},{}'.format(labels, label) if labels else label
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port=0, host='127.0.0.1', registry=None):
+    """Serve the statistics of registry (default REGISTRY) over HTTP from a daemon thread.
+
+    GET /metrics returns the Prometheus text format, GET /metrics.json the JSON one.
+
+    Parameters
+    ----------
+    port: int, opt
+        Default: any free port.
+    host: str, opt
+        Default: only local connections.
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        Its server_address gives the port used, stop it with shutdown().
+    """
+    registry = registry if registry is not None else REGISTRY
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = registry.to_json(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            body = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='salpytools_metrics', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,174 @@
+import time
+import logging
+from functools import partial
+from .topic_catalog import get_catalog
+from .metrics import REGISTRY
+from .utils import create_logger
+
+"""
+Prepared publishers of Telemetry and Event topics.
+
+DDSSend.send_Telemetry()/send_Event() resolve the data class, the topic
+registration and the put method of the topic on every call. A TopicPublisher
+does it once and keeps a preallocated struct, so publishing a sample is a few
+setattr and one call to SAL.
+"""
+
+__all__ = ['TopicPublisher']
+
+LOGGER = create_logger(name=__name__)
+
+
+class TopicPublisher:
+    """Publish the samples of one Telemetry or Event topic.
+
+    The struct in data is reused: put() only changes the fields it is given,
+    the other ones keep the value they had in the previous sample. Use
+    make_data()/publish() to send a struct built from scratch.
+
+    Attributes:
+        device: Name of the SALPY component.
+        topic: Name of the topic (e.g. mountStatus).
+        stype: 'Telemetry' or 'Event'.
+        name: Full name of the topic (e.g. atHeaderService_logevent_mountStatus).
+        data_class: SALPY class of the samples.
+        data: The preallocated struct.
+        schema: TopicSchema of the topic.
+        priority: Priority of the Events.
+        nsent: Number of samples published.
+        log_fields: Log the value of each field set at debug level. Off by
+            default, as it is costly when publishing at high rate.
+    """
+    log_fields = False
+
+    def __init__(self, manager, device, topic, stype='Telemetry', priority=1):
+        if stype not in ('Telemetry', 'Event'):
+            raise ValueError('stype must be Telemetry or Event, got {}'.format(stype))
+        self.device = device
+        self.topic = topic
+        self.stype = stype
+        self.priority = priority
+        self.nsent = 0
+        self.log = LOGGER
+
+        info = get_catalog(device, manager.SALPY_lib).get(topic, stype)
+        self.name = info.name
+        self.data_class = info.data_class
+        self.data = self.data_class()
+        self.schema = info.schema
+        self.fields = frozenset(self.schema.fields)
+        if stype == 'Telemetry':
+            manager.salTelemetryPub(self.name)
+            self._put = getattr(manager, 'putSample_{}'.format(topic))
+        else:
+            manager.salEvent(self.name)
+            self._put = getattr(manager, 'logEvent_{}'.format(topic))
+        REGISTRY.register(self, 'publisher', device=device, topic=self.name, device_id=manager.device_id)
+
+    def __repr__(self):
+        return 'TopicPublisher({})'.format(self.name)
+
+    def stats(self):
+        return {'sent': self.nsent}
+
+    def close(self):
+        REGISTRY.unregister(self)
+
+    def setter(self, field):
+        """Return a function setting field in the preallocated struct."""
+        if field not in self.fields:
+            raise AttributeError('No {} in {}'.format(field, self.name))
+        return partial(setattr, self.data, field)
+
+    def set(self, **kwargs):
+        """Update the fields of the preallocated struct, unknown fields are skipped."""
+        self._update(self.data, kwargs)
+
+    def make_data(self, **kwargs):
+        """Return a new struct with the given fields."""
+        data = self.data_class()
+        self._update(data, kwargs)
+        return data
+
+    def put(self, **kwargs):
+        """Update the preallocated struct and publish it."""
+        if len(kwargs) > 0:
+            self._update(self.data, kwargs)
+        return self.publish(self.data)
+
+    def publish(self, data=None, priority=None):
+        """Publish a struct (default: the preallocated one).
+
+        priority is only used by Events (default: self.priority).
+        """
+        data = self.data if data is None else data
+        self.nsent += 1
+        if self.stype == 'Telemetry':
+            return self._put(data)
+        return self._put(data, self.priority if priority is None else priority)
+
+    def publish_many(self, rows, fields=None, rate=None):
+        """Publish many samples through the preallocated struct.
+
+        Parameters
+        ----------
+        rows: iterable
+            dictionaries {field: value}, tuples ordered as fields, or a NumPy
+            structured array (fields are then the names of its dtype).
+        fields: list
+            Names of the fields of tuple rows, required with tuple rows.
+        rate: float, opt
+            Publish at most rate samples per second. Default: as fast as possible.
+
+        Returns
+        -------
+        int
+            Number of samples published.
+
+        Raises
+        ------
+        ValueError
+            If rows are tuples and fields is not given.
+        """
+        dtype = getattr(rows, 'dtype', None)
+        if dtype is not None and dtype.names is not None:
+            fields = dtype.names
+            # One conversion per column instead of one per sample
+            rows = zip(*[rows[name].tolist() for name in fields])
+        if fields is not None:
+            unknown = [field for field in fields if field not in self.fields]
+            if len(unknown) > 0:
+                raise AttributeError('No {} in {}'.format(', '.join(unknown), self.name))
+
+        data = self.data
+        put = self.publish
+        period = 1. / rate if rate else 0.
+        start = time.monotonic()
+        nsent = 0
+        for row in rows:
+            if isinstance(row, dict):
+                self._update(data, row)
+            elif fields is None:
+                raise ValueError('The names of the fields of the tuple rows of {} are '
+                                 'needed.'.format(self.name))
+            else:
+                for field, value in zip(fields, row):
+                    setattr(data, field, value)
+            if period > 0:
+                delay = start + nsent * period - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            put(data)
+            nsent += 1
+        return nsent
+
+    def _update(self, data, kwargs):
+        fields = self.fields
+        log_fields = self.log_fields and self.log.isEnabledFor(logging.DEBUG)
+        for key, value in kwargs.items():
+            if key in fields:
+                setattr(data, key, value)
+                if log_fields:
+                    self.log.debug('%s.%s = %s', self.name, key, value)
+            else:
+                self.log.warning('No %s in %s [skipping]', key, self.name)
@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import OrderedDict
+
+"""
+Bounded table of the responses to the commands sent by DDSSend.
+
+Completed commands are evicted once they are older than a time-to-live, or
+least recently used first when the table is full, so that a process sending
+commands for weeks does not keep all their responses. Every operation is O(1)
+(amortized), nothing scans the whole table.
+"""
+
+__all__ = ['ResponseTable']
+
+
+class ResponseTable:
+    """Dictionary {cmdid: response} with TTL/LRU eviction of completed commands.
+
+    Pending commands are kept in the order they were added, completed commands
+    (see mark_done()) in the order they were completed or last looked up. When
+    the table is full the least recently used completed command is evicted, and
+    only if there is none the oldest pending command. With pending_ttl, pending
+    commands older than that are evicted as well (e.g. commands whose final ack
+    was lost).
+
+    Attributes:
+        maxsize: Maximum number of responses kept.
+        ttl: Seconds a completed command is kept (None: until evicted by size).
+        pending_ttl: Seconds a pending command is kept (None: until completed).
+        nevicted: Number of responses evicted.
+    """
+    def __init__(self, maxsize=10000, ttl=600., pending_ttl=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be >= 1, got {}'.format(maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.nevicted = 0
+        self._pending = OrderedDict()  # cmdid: (time added, response)
+        self._done = OrderedDict()  # cmdid: (time completed or used, response)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending) + len(self._done)
+
+    def __contains__(self, cmdid):
+        return cmdid in self._pending or cmdid in self._done
+
+    def __getitem__(self, cmdid):
+        response = self.get(cmdid)
+        if response is None:
+            raise KeyError(cmdid)
+        return response
+
+    def __setitem__(self, cmdid, response):
+        now = time.monotonic()
+        with self._lock:
+            # If SAL reuses a cmdid, the new command replaces the old one.
+            self._done.pop(cmdid, None)
+            self._pending.pop(cmdid, None)
+            self._pending[cmdid] = (now, response)
+            self._evict(now)
+
+    def get(self, cmdid, default=None):
+        """Return the response of a command, refreshing it if it is completed."""
+        with self._lock:
+            entry = self._pending.get(cmdid)
+            if entry is not None:
+                return entry[1]
+            entry = self._done.get(cmdid)
+            if entry is None:
+                return default
+            self._done[cmdid] = (time.monotonic(), entry[1])
+            self._done.move_to_end(cmdid)
+            return entry[1]
+
+    def mark_done(self, cmdid):
+        """Move a command to the completed ones, from then on it can expire."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.pop(cmdid, None)
+            if entry is not None:
+                self._done[cmdid] = (now, entry[1])
+            self._evict(now)
+
+    def expire(self):
+        """Evict the expired commands, the table also does it when it is modified."""
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def _evict(self, now):
+        # Both dictionaries are ordered by time, only their heads are looked at
+        while len(self._done) > 0:
+            cmdid, (stamp, _) = next(iter(self._done.items()))
+            if len(self) <= self.maxsize and (self.ttl is None or now - stamp < self.ttl):
+                break
+            del self._done[cmdid]
+            self.nevicted += 1
+        while len(self._pending) > 0:
+            cmdid, (stamp, _) = next(iter(self._pending.items()))
+            if len(self) <= self.maxsize and (self.pending_ttl is None or now - stamp < self.pending_ttl):
+                break
+            del self._pending[cmdid]
+            self.nevicted += 1
+
+    def stats(self):
+        return {'pending': len(self._pending),
+                'done': len(self._done),
+                'evicted': self.nevicted}
@@ -0,0 +1,74 @@
+import threading
+import itertools
+import collections
+
+__all__ = ['RingBuffer']
+
+
+class RingBuffer:
+    """Fixed-capacity, thread-safe history of samples.
+
+    Appending is O(1); once capacity is reached the oldest entries are
+    dropped. Every appended item gets a sequence number (starting at 1),
+    so readers can ask for what arrived since the last time they looked.
+
+    Attributes:
+        capacity: Maximum number of items kept.
+        seq: Sequence number of the last appended item (0 if empty).
+    """
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1, got {}'.format(capacity))
+        self.capacity = capacity
+        self.seq = 0
+        self._items = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, item):
+        """Add an item, return its sequence number."""
+        with self._lock:
+            self._items.append(item)
+            self.seq += 1
+            return self.seq
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def snapshot(self):
+        """Return a list with all the items, oldest first."""
+        with self._lock:
+            return list(self._items)
+
+    def latest(self, default=None):
+        """Return the most recent item, or default if empty."""
+        try:
+            return self._items[-1]
+        except IndexError:
+            return default
+
+    def last(self, k):
+        """Return the k most recent items, oldest first."""
+        if k <= 0:
+            return []
+        with self._lock:
+            return list(itertools.islice(reversed(self._items), k))[::-1]
+
+    def since(self, seq):
+        """Return the items appended after sequence number seq, oldest first.
+
+        Items that were already dropped from the buffer are not returned.
+
+        Returns
+        -------
+        int, list
+            The sequence number of the last item and the list of items. Pass
+            the former to the next call to get only the new items.
+        """
+        with self._lock:
+            n = min(self.seq - seq, len(self._items))
+            items = list(itertools.islice(reversed(self._items), n))[::-1] if n > 0 else []
+            return self.seq, items
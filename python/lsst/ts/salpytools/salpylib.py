@@ -1,12 +1,24 @@
 import time
-import sys
 import threading
-import inspect
 from importlib import import_module
-import itertools
 import logging
 import asyncio
-from .utils import create_logger, load_SALPYlib
+import collections
+import functools
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from .utils import create_logger, topic_name
+from .manager_pool import get_manager, release_manager
+from .ring_buffer import RingBuffer
+from .topic_schema import get_schema
+from .topic_catalog import get_catalog
+from .columnar import ColumnarBuffer
+from .async_poller import AsyncPoller
+from .backoff import AdaptiveInterval
+from .metrics import LatencyHistogram, REGISTRY
+from .response_table import ResponseTable
+from .latest_values import LatestValueCache
+from .publisher import TopicPublisher
 from .state_transition_exception import StateTransitionException
 
 
@@ -15,8 +27,11 @@ A Set of Python classes and tools to subscribe to LSST/SAL DDS topics using the
 The the Main classes in the module are:
 
 - DDSController:  Subscribe and acknowleges Commands for a Device (threaded)
+- DDSCommandDispatcher: Accept all the Commands of a Device from a single thread
 - DDSSubcriber: Subscribe to Command/Telemetry/Event topics for a Device (threaded)
+- DDSPoller: Read many DDSSubscriber topics, of one or several Devices, from a single thread
 - DDSSend: Generates/send Telemetry, Events or Commands for a Device (non-threaded)
+- CommandSequencer: Send commands to Devices following their dependencies, concurrently when possible
 - DeviceState: Class Used by DDSController to store the state of the Commandable-Component/Device
 
 """
@@ -27,7 +42,8 @@ The the Main classes in the module are:
 # - Send Control commands (to sim OCS)
 # NOTE: all import of SALPY_{moduleName} are done on the fly using the fuction load_SALPYlib()
 
-__all__ = ['DDSController', 'DDSSubscriber', 'DDSSend']
+__all__ = ['DDSController', 'DDSCommandDispatcher', 'DDSSubscriber', 'DDSPoller', 'DDSSend',
+           'CommandStep', 'CommandSequencer']
 
 
 SAL__CMD_ABORTED = -303
@@ -40,10 +56,11 @@ SAL__CMD_NOPERM = -300
 SAL__CMD_STALLED = 302
 SAL__CMD_TIMEOUT = -304
 
-spinner = itertools.cycle(['-', '/', '|', '\\'])
-
 LOGGER = create_logger(name=__name__)
 
+# When a sample was received (time.monotonic()) and sent (its private_sndStamp, None if unknown)
+SampleTime = collections.namedtuple('SampleTime', ['received', 'sent'])
+
 
 class DDSController(threading.Thread):
     """Class to subscribe and react to Commands for a Context.
@@ -70,8 +87,36 @@ class DDSController(threading.Thread):
         match the exact name of the command defined within the EFDB Topic tag.
         topic: Name of the complete topic we wish to subscribe to. If left empty
         we use the command and subsytem_tag.
+        tsleep: Time between polls for new commands. If max_tsleep is given,
+        the time between polls grows up to max_tsleep while no command is
+        received (see AdaptiveInterval).
+        ack_latency: LatencyHistogram of the time from the command being
+        sent (its private_sndStamp, meaningful only if the clocks of the two
+        hosts are synchronized) to the ACK being sent, so including the time
+        the command waited to be polled. Without private_sndStamp, the time
+        from the poll that accepted it.
+        execution_time: LatencyHistogram of the time from the ACK to the
+        final ack.
+        max_concurrent: Maximum number of instances of the command executed at
+        the same time.
+        queue_size: Maximum number of commands waiting for execution when
+        max_concurrent are running. Commands received when the queue is full
+        are rejected with SAL__CMD_NOPERM.
+        executor: concurrent.futures.Executor running context.execute_command.
+        Default: a ThreadPoolExecutor with max_concurrent workers. If
+        context.execute_command is a coroutine function, it is run in loop
+        instead (an asyncio event loop running in another thread).
+        reply_thread: concurrent.futures.Future of the last command started
+        (None if none was). Commands used to run in a thread, use
+        reply_thread.done() instead of reply_thread.is_alive().
+
+    context.execute_command(command, data) receives a TopicSample, an
+    immutable copy of the parameters of the command (fields are read as on
+    the SALPY struct, array fields are tuples), not the SALPY struct itself
+    which is overwritten by the next command accepted.
     """
-    def __init__(self, context, command=None, topic=None, device_id=None, threadID='1', tsleep=0.5):
+    def __init__(self, context, command=None, topic=None, device_id=None, threadID='1', tsleep=0.5,
+                 max_tsleep=None, max_concurrent=1, queue_size=0, executor=None, loop=None):
 
         # Either a command or topic need to be defined to tell this
         # DDSController what topic to subscribe and react to.
@@ -87,27 +132,52 @@ class DDSController(threading.Thread):
         # Create a logger
         self.log = logging.getLogger(self.subsystem_tag)
 
-        self.log.debug('Starting DDSController for {}:{}'.format(self.subsystem_tag,
-                                                                 self.COMMAND))
+        self.log.debug('Starting DDSController for %s:%s', self.subsystem_tag, self.COMMAND)
 
         if not topic:
             self.topic = "{}_command_{}".format(self.subsystem_tag, self.command)
         else:
             self.topic = topic
         self.threadID = threadID
-        self.reply_thread = None
         self.shutdown_flag = threading.Event()
         self.shutdown_flag.clear()
 
         self.tsleep = tsleep
+        self.interval = AdaptiveInterval(tsleep, max_tsleep)
         self.context = context
         self.daemon = True
 
         self.newControl = False
 
+        # Execution of the commands
+        if max_concurrent < 1:
+            raise ValueError('max_concurrent must be >= 1, got {}'.format(max_concurrent))
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.is_coroutine = asyncio.iscoroutinefunction(context.execute_command)
+        if self.is_coroutine and loop is None:
+            raise ValueError('context.execute_command is a coroutine function, an event loop is needed.')
+        self.loop = loop
+        self.executor = executor
+        self.own_executor = False
+        self.running = 0  # Number of commands being executed
+        self.reply_thread = None  # Future of the last command started
+        self.pending = collections.deque()  # (cmdid, data) waiting for execution
+        self._lock = threading.Lock()
+
+        self.ack_latency = LatencyHistogram()
+        self.execution_time = LatencyHistogram()
+        # Counters of commands: accepted, rejected (too many running), completed, failed
+        self.naccepted = 0
+        self.nrejected = 0
+        self.ncompleted = 0
+        self.nfailed = 0
+        self.max_pending = 0  # Most commands waiting in pending
+
         # Subscribe
         self.mgr = None  # SAL Manager
         self.myData = None  # SAL topic
+        self.schema = None
         self.mgr_acceptCommand = None  # Accept command
         self.mgr_ackCommand = None  # Ack command
 
@@ -118,35 +188,27 @@ class DDSController(threading.Thread):
         # self.mgr = SALPY_tcs.SAL_tcs()
         # The steps are:
         # - 'figure out' the SALPY_xxxx subsystem_tag name
-        # - find the library pointer using globals()
-        # - create a mananger
+        # - get a (shared) manager from the pool, claiming the command reader
         # Here we do the equivalent of:
         # mgr.salProcessor("atHeaderService_command_EnterControl")
         # Get the mgr
-        SALPY_lib = import_module('SALPY_{}'.format(self.subsystem_tag))
+        self.mgr = get_manager(self.subsystem_tag, self.device_id, claim=self.topic)
+        self.device_id = self.mgr.device_id
+        SALPY_lib = self.mgr.SALPY_lib
 
-        if self.device_id is None:
-            self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.subsystem_tag))()
-        else:
-            try:
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.subsystem_tag))(self.device_id)
-            except TypeError:
-                self.log.error('Could not initialize component {} '
-                               'with device id {}. Trying with no id.'.format(self.subsystem_tag,
-                                                                              self.device_id))
-                self.device_id = None
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.subsystem_tag))()
-
-        # self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.subsystem_tag))()
         self.mgr.salProcessor(self.topic)
-        self.myData = getattr(SALPY_lib, self.topic+'C')()
-        self.log.info("{} controller ready for topic: {}".format(self.subsystem_tag, self.topic))
+        self.myData = get_catalog(self.subsystem_tag, SALPY_lib).by_name(self.topic).new_data()
+        self.schema = get_schema(self.myData)
+        self._has_sndstamp = 'private_sndStamp' in self.schema.fields
+        self.log.info("%s controller ready for topic: %s", self.subsystem_tag, self.topic)
 
         # We use getattr to get the equivalent of for our accept and ack command
         # mgr.acceptCommand_EnterControl()
         # mgr.ackCommand_EnterControl
         self.mgr_acceptCommand = getattr(self.mgr, 'acceptCommand_{}'.format(self.command))
         self.mgr_ackCommand = getattr(self.mgr, 'ackCommand_{}'.format(self.command))
+        REGISTRY.register(self, 'controller', device=self.subsystem_tag, command=self.command,
+                          device_id=self.device_id)
 
     def run(self):
         self.log.debug('Running...')
@@ -154,24 +216,123 @@ class DDSController(threading.Thread):
 
     def run_command(self):
         while not self.shutdown_flag.is_set():
-            cmdId = self.mgr_acceptCommand(self.myData)
-            if cmdId > 0:
-                self.mgr_ackCommand(cmdId, SAL__CMD_ACK, 0, "Command received : OK")
-                if self.reply_thread is not None and self.reply_thread.is_alive():
-                    self.log.warning('Still replying to a previous command!')
-                    self.mgr_ackCommand(cmdId, SAL__CMD_NOPERM, -1, "Still replying to a previous command!")
-                else:
-                    self.reply_thread = threading.Thread(target=self.reply_to_transition, args=(cmdId, ))
-                    self.reply_thread.start()
-                    # self.reply_to_transition(cmdId)
-                    self.newControl = True
-            time.sleep(self.tsleep)
+            nread = self.accept_pending()
+            time.sleep(self.interval.update(nread))
         self.log.debug('Stopping...')
+        self.close()
+
+    def close(self):
+        """Give the SAL manager back to the pool and shut down our executor."""
+        if self.own_executor:
+            self.executor.shutdown(wait=False)
+        REGISTRY.unregister(self)
+        release_manager(self.mgr, claim=self.topic)
+
+    def accept(self):
+        """Accept a new command, if there is one, ack it and start executing it.
+
+        Returns
+        -------
+        int
+            The command id, <= 0 if there was no new command.
+        """
+        polled = time.monotonic()
+        cmdId = self.mgr_acceptCommand(self.myData)
+        if cmdId > 0:
+            self.naccepted += 1
+            self.mgr_ackCommand(cmdId, SAL__CMD_ACK, 0, "Command received : OK")
+            sent = self.myData.private_sndStamp if self._has_sndstamp else None
+            if sent:
+                now = time.time()
+                if now >= sent:
+                    self.ack_latency.add(now - sent)
+            else:
+                self.ack_latency.add(time.monotonic() - polled)
+            # Hand a copy of the data, self.myData is overwritten by the next command
+            data = self.schema.snapshot(self.myData)
+            with self._lock:
+                execute = self.running < self.max_concurrent
+                if execute:
+                    self.running += 1
+                queued = not execute and len(self.pending) < self.queue_size
+                if queued:
+                    self.pending.append((cmdId, data))
+                    if len(self.pending) > self.max_pending:
+                        self.max_pending = len(self.pending)
+            if execute:
+                if not self.start_command(cmdId, data):
+                    self.command_done(None)
+                self.newControl = True
+            elif not queued:
+                self.nrejected += 1
+                self.log.warning('Still replying to a previous command!')
+                self.mgr_ackCommand(cmdId, SAL__CMD_NOPERM, -1, "Still replying to a previous command!")
+        return cmdId
+
+    def execute(self, cmdid, data):
+        """Run reply_to_transition in the executor (or the event loop).
+
+        Returns
+        -------
+        concurrent.futures.Future
+        """
+        if self.is_coroutine:
+            future = asyncio.run_coroutine_threadsafe(self.reply_to_transition_async(cmdid, data), self.loop)
+        else:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                   thread_name_prefix=self.topic)
+                self.own_executor = True
+            future = self.executor.submit(self.reply_to_transition, cmdid, data)
+        self.reply_thread = future
+        future.add_done_callback(self.command_done)
+        return future
+
+    def start_command(self, cmdid, data):
+        """Execute a command, failing it if it cannot be started (e.g. executor shut down, loop closed).
+
+        Returns
+        -------
+        bool
+            True if the command was started.
+        """
+        try:
+            self.execute(cmdid, data)
+        except Exception as exception:
+            self.reply_exception(cmdid, exception)
+            return False
+        return True
+
+    def command_done(self, future):
+        """Start the next queued command, if any (the command that finished keeps its slot)."""
+        while True:
+            with self._lock:
+                if len(self.pending) == 0:
+                    self.running -= 1
+                    return
+                cmdid, data = self.pending.popleft()
+            if self.start_command(cmdid, data):
+                return
+
+    def accept_pending(self, max_commands=None):
+        """Accept all the pending commands (at most max_commands).
+
+        Returns
+        -------
+        int
+            Number of commands accepted.
+        """
+        naccepted = 0
+        while max_commands is None or naccepted < max_commands:
+            if self.accept() <= 0:
+                break
+            naccepted += 1
+        return naccepted
 
     def stop(self):
         self.shutdown_flag.set()
 
-    def reply_to_transition(self, cmdid):
+    def reply_to_transition(self, cmdid, data=None):
         """Delegate the command revcieved to the Context object.
 
         When creating a DDSController object we pass a Context object upon
@@ -182,29 +343,149 @@ class DDSController(threading.Thread):
 
         Attributes:
             cmdid: ID handle of the command this DDSController is watching.
+            data: Parameters of the command. Default: self.myData.
         """
 
+        start_time = time.monotonic()
+        data = self.myData if data is None else data
         self.mgr_ackCommand(cmdid, SAL__CMD_INPROGRESS, 0, "Starting: OK")
         try:
             self.log.debug('Starting command execution ...')
-            err, message = self.context.execute_command(self.COMMAND, self.myData)
+            err, message = self.context.execute_command(self.COMMAND, data)
             self.log.debug('Command execution complete...')
-        except StateTransitionException as exception:
-            self.log.error('Exception while executing {}.'.format(self.COMMAND))
-            self.log.exception(exception)
+        except Exception as exception:
+            self.reply_exception(cmdid, exception)
+        else:
+            self.reply_complete(cmdid, err, message)
+        self.execution_time.add(time.monotonic() - start_time)
+
+    async def reply_to_transition_async(self, cmdid, data=None):
+        """Same as reply_to_transition, when context.execute_command is a coroutine function."""
+        start_time = time.monotonic()
+        data = self.myData if data is None else data
+        self.mgr_ackCommand(cmdid, SAL__CMD_INPROGRESS, 0, "Starting: OK")
+        try:
+            self.log.debug('Starting command execution ...')
+            err, message = await self.context.execute_command(self.COMMAND, data)
+            self.log.debug('Command execution complete...')
+        except Exception as exception:
+            self.reply_exception(cmdid, exception)
+        else:
+            self.reply_complete(cmdid, err, message)
+        self.execution_time.add(time.monotonic() - start_time)
+
+    def reply_exception(self, cmdid, exception):
+        with self._lock:
+            self.nfailed += 1
+        self.log.error('Exception while executing %s.', self.COMMAND)
+        self.log.exception(exception)
+        if isinstance(exception, StateTransitionException):
             self.mgr_ackCommand(cmdid, SAL__CMD_NOPERM, 1,
                                 "State transition not allowed.")
-        except Exception as exception:
-            self.log.error('Exception while executing {}.'.format(self.COMMAND))
-            self.log.exception(exception)
+        else:
             self.mgr_ackCommand(cmdid, SAL__CMD_FAILED, 1,
                                 "{} exception occurred when running {}.".format(exception.__class__.__name__,
                                                                                 self.COMMAND))
-        else:
-            self.log.debug('Sending {} ack with {} {}'.format(SAL__CMD_COMPLETE,
-                                                              err,
-                                                              message))
-            self.mgr_ackCommand(cmdid, SAL__CMD_COMPLETE, err, message)
+
+    def reply_complete(self, cmdid, err, message):
+        with self._lock:
+            self.ncompleted += 1
+        self.log.debug('Sending %s ack with %s %s', SAL__CMD_COMPLETE, err, message)
+        self.mgr_ackCommand(cmdid, SAL__CMD_COMPLETE, err, message)
+
+    def latency_stats(self):
+        return {'ack_latency': self.ack_latency.stats(),
+                'execution_time': self.execution_time.stats()}
+
+    def stats(self):
+        """Return the counters of commands, the pending queue, the latencies and the poll interval."""
+        return {'accepted': self.naccepted,
+                'rejected': self.nrejected,
+                'completed': self.ncompleted,
+                'failed': self.nfailed,
+                'running': self.running,
+                'pending': len(self.pending),
+                'max_pending': self.max_pending,
+                'ack_latency': self.ack_latency.stats(),
+                'execution_time': self.execution_time.stats(),
+                'interval': self.interval.stats()}
+
+
+class DDSCommandDispatcher(threading.Thread):
+    """Accept the commands of a Context in a single thread.
+
+    Instead of one DDSController thread per command, each polling every 0.5 s,
+    the dispatcher owns (non-started) DDSControllers for all the commands and
+    polls all of them, accepting every pending command at each wakeup. With
+    the default tsleep commands are acked within a few milliseconds. If
+    max_tsleep is given the interval grows up to max_tsleep while no command
+    is received (see AdaptiveInterval).
+
+    Attributes:
+        controllers: Dictionary of DDSController keyed by command name.
+        tsleep: Shortest time between polls.
+        max_concurrent, queue_size: Limits for each command, see DDSController.
+        executor: ThreadPoolExecutor (max_workers threads) shared by all the commands.
+    """
+    def __init__(self, context, commands=(), device_id=None, tsleep=0.005, max_tsleep=None,
+                 max_concurrent=1, queue_size=0, max_workers=None, loop=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.context = context
+        self.device_id = device_id
+        # All the commands are executed by a shared pool of threads (or in loop, see DDSController)
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='{}_commands'.format(context.subsystem_tag))
+        self.tsleep = tsleep
+        self.interval = AdaptiveInterval(tsleep, max_tsleep)
+        self.controllers = {}
+        self.shutdown_flag = threading.Event()
+        self.log = logging.getLogger(context.subsystem_tag)
+
+        for command in commands:
+            self.add_command(command)
+
+    def add_command(self, command):
+        """Create a DDSController for command and accept it from this thread.
+
+        Returns
+        -------
+        DDSController
+        """
+        controller = DDSController(self.context, command=command, device_id=self.device_id,
+                                   tsleep=self.tsleep, max_concurrent=self.max_concurrent,
+                                   queue_size=self.queue_size, executor=self.executor, loop=self.loop)
+        self.controllers[command] = controller
+        return controller
+
+    def run(self):
+        self.log.debug('Dispatching %i commands...', len(self.controllers))
+        while not self.shutdown_flag.is_set():
+            naccepted = 0
+            for controller in list(self.controllers.values()):
+                try:
+                    naccepted += controller.accept_pending()
+                except Exception:
+                    self.log.exception('Error while accepting %s.', controller.topic)
+            self.shutdown_flag.wait(self.interval.update(naccepted))
+        self.log.debug('Stopping...')
+        for controller in self.controllers.values():
+            controller.close()
+        self.executor.shutdown(wait=False)
+
+    def stop(self):
+        self.shutdown_flag.set()
+
+    def latency_stats(self):
+        """Return {command: {'ack_latency': ..., 'execution_time': ...}}, see LatencyHistogram.stats."""
+        return {command: controller.latency_stats() for command, controller in self.controllers.items()}
+
+    def stats(self):
+        """Return {command: DDSController.stats()}."""
+        return {command: controller.stats() for command, controller in self.controllers.items()}
 
 
 class DDSSubscriberThread(threading.Thread):
@@ -237,6 +518,7 @@ class DDSSubscriberThread(threading.Thread):
         self.salpy_lib = None
         self.mgr = None
         self.data = None
+        self.schema = None
 
         # We will turn only a single flag to true on mgr_subscibe_to_topic()
         self.is_command = False
@@ -311,12 +593,13 @@ class DDSSubscriberThread(threading.Thread):
         self.set_mgr()                 # self.mgr = SAL_scheduler()
         self.mgr_subscribe_to_topic()  # self.mgr.salEvent("scheduler_[topic]")
         self.set_data()                # self.data = scheduler_logevent_[topic]C
+        self.set_schema()              # Fields of scheduler_logevent_[topic]C
 
     def set_salpy_lib(self):
         self.salpy_lib = import_module('SALPY_{}'.format(self.subsystem_tag))
 
     def set_mgr(self):
-        self.mgr = getattr(self.salpy_lib, 'SAL_{}'.format(self.subsystem_tag))()
+        self.mgr = get_manager(self.subsystem_tag, claim=self.topic)
 
     def mgr_subscribe_to_topic(self):
         """The topic can be Telemetry, a Command, or an Event. We know which it
@@ -356,18 +639,28 @@ class DDSSubscriberThread(threading.Thread):
                              "configure(). If this does not resolve the problem "
                              "file a bug report.")
 
-        elif self.is_event:
-            self.data = getattr(self.salpy_lib, "{}C".format(self.topic))()
-        elif self.is_telemetry:
-            self.data = getattr(self.salpy_lib, "{}C".format(self.topic))()
+        elif self.is_event or self.is_telemetry:
+            self.data = get_catalog(self.subsystem_tag, self.salpy_lib).by_name(self.topic).new_data()
 
         else:
             raise ValueError("There are improperly configured attributes, call "
                              "configure(). If this does not resolve the problem "
                              "file a bug report.")
 
+    def set_schema(self):
+        # Get all the attributes of the self.data object, only once
+        # https://stackoverflow.com/questions/5969806/print-all-properties-of-a-python-class
+        if self.data is None:
+            raise ValueError("There are improperly configured attributes, call "
+                             "configure(). If this does not resolve the problem "
+                             "file a bug report.")
+        self.schema = get_schema(self.data)
+
     def run(self):
 
+        if self.schema is None:
+            self.set_schema()
+
         if self.is_event:
             self.run_event()
 
@@ -382,15 +675,7 @@ class DDSSubscriberThread(threading.Thread):
             retval = self.getEvent(self.data)
 
             if retval == 0:
-
-                # Get all the attributes of the self.data object
-                # https://stackoverflow.com/questions/5969806/print-all-properties-of-a-python-class
-                attributes = [attr for attr in dir(self.data) if not attr.startswith('__')]
-
-                for attribute in attributes:
-                    value = getattr(self.data, attribute)
-
-                    self.handle[attribute] = value
+                self.handle.update(self.schema.as_dict(self.data))
 
             time.sleep(self.rate)
 
@@ -402,23 +687,33 @@ class DDSSubscriberThread(threading.Thread):
             retval = self.getNextSample(self.data)
 
             if retval == 0:
+                self.handle.update(self.schema.as_dict(self.data))
 
-                # Get all the attributes of the self.data object
-                # https://stackoverflow.com/questions/5969806/print-all-properties-of-a-python-class
-                attributes = [attr for attr in dir(self.data) if not attr.startswith('__')]
+            time.sleep(self.rate)
 
-                for attribute in attributes:
-                    value = getattr(self.data, attribute)
 
-                    self.handle[attribute] = value
+class DDSSubscriberMain:
+    """Non Thread version of DDSSubscriber
 
-            time.sleep(self.rate)
+    The samples can be received with:
 
+        sample = await subscriber.next(timeout=10)
+        async for sample in subscriber.stream():
+            ...
+        subscriber.add_callback(coroutine_function)
+
+    All the subscribers sharing a SAL manager are read by a single asyncio task
+    (see AsyncPoller). Received samples wait for next()/stream() in a queue of
+    size queue_size; when it is full the oldest (overflow='drop_oldest') or the
+    newest (overflow='drop_newest') sample is dropped.
+
+    run_Telem/run_Event/run_Command read the topic directly, do not mix them
+    with the methods above.
+    """
+    overflow_policies = ('drop_oldest', 'drop_newest')
 
-class DDSSubscriberMain:
-    """Non Thread version of DDSSubscriber"""
     def __init__(self, Device, topic, device_id=None, Stype='Telemetry',
-                 tsleep=0.01):
+                 tsleep=0.01, queue_size=100, overflow='drop_oldest'):
 
         self.Device = Device
         self.topic = topic
@@ -429,12 +724,27 @@ class DDSSubscriberMain:
         self.tsleep = tsleep
         self.Stype = Stype
 
+        if overflow not in self.overflow_policies:
+            raise ValueError('overflow must be one of {}, got {}'.format(self.overflow_policies, overflow))
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.queue = None  # asyncio.Queue, created by next()/stream()
+        self.callbacks = []
+        self._tasks = set()  # Running coroutine callbacks, the loop only keeps weak references
+        self.nread = 0  # Samples received
+        self.ndropped = 0  # Samples dropped because the queue was full
+        self.max_queued = 0  # Most samples waiting in the queue
+
         self.getNextSample = None  # Method to get telemetry
         self.getEvent = None  # Method to get Event
         self.myData = None  # Method to get Commands
         self.acceptCommand = None  # Method to accept command
+        self.cmdId = None
 
         self.mgr = None  # SAL Manager
+        self.schema = None
+        self.poller = None  # AsyncPoller
+        self.topic_name = topic_name(self.Device, self.topic, self.Stype)
 
         self.subscribe()
 
@@ -444,46 +754,140 @@ class DDSSubscriberMain:
         # self.mgr = SALPY_tcs.SAL_tcs()
         # The steps are:
         # - 'figure out' the SALPY_xxxx Device name
-        # - find the library pointer using globals()
-        # - create a mananger
-
-        SALPY_lib = import_module('SALPY_{}'.format(self.Device))
+        # - get a (shared) manager from the pool, claiming the topic we read
 
-        if self.device_id is None:
-            self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))()
-        else:
-            try:
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))(self.device_id)
-            except TypeError:
-                self.log.error('Could not initialize component {} '
-                               'with device id {}. Trying with no id.'.format(self.Device, self.device_id))
-                self.device_id = None
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))()
+        self.mgr = get_manager(self.Device, self.device_id, claim=self.topic_name)
+        self.device_id = self.mgr.device_id
+        catalog = get_catalog(self.Device, self.mgr.SALPY_lib)
 
         if self.Stype == 'Telemetry':
-            self.myData = getattr(SALPY_lib, '{}_{}C'.format(self.Device, self.topic))()
-            self.mgr.salTelemetrySub("{}_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salTelemetrySub(self.topic_name)
             # Generic method to get for example: self.mgr.getNextSample_kernel_FK5Target
             self.getNextSample = getattr(self.mgr, "getNextSample_{}".format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
         elif self.Stype == 'Event':
-            self.myData = getattr(SALPY_lib, '{}_logevent_{}C'.format(self.Device, self.topic))()
-            self.mgr.salEvent("{}_logevent_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salEvent(self.topic_name)
             # Generic method to get for example: self.mgr.getEvent_startIntegration(event)
             self.getEvent = getattr(self.mgr, 'getEvent_{}'.format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
         elif self.Stype == 'Command':
             self.log.warning('This method is not intended to be used to listen to commands. '
                              'Unless you know what you are doing, you are probably looking for '
                              'DDSController instead.')
-            self.myData = getattr(SALPY_lib, '{}_command_{}C'.format(self.Device, self.topic))()
-            self.mgr.salProcessor("{}_command_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salProcessor(self.topic_name)
             # Generic method to get for example: self.mgr.acceptCommand_takeImages(event)
             self.acceptCommand = getattr(self.mgr, 'acceptCommand_{}'.format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
+
+        if self.myData is not None:
+            self.schema = get_schema(self.myData)
+        REGISTRY.register(self, 'async_subscriber', device=self.Device, topic=self.topic_name,
+                          device_id=self.device_id)
+
+    def stats(self):
+        """Return the counters of samples received and dropped, and the queue length and high-water mark."""
+        return {'read': self.nread,
+                'dropped': self.ndropped,
+                'queued': self.queue.qsize() if self.queue is not None else 0,
+                'max_queued': self.max_queued}
+
+    def poll(self):
+        """Read a new sample, if there is one.
+
+        Returns
+        -------
+        TopicSample or None
+            A copy of the sample.
+        """
+        if self.Stype == 'Telemetry':
+            if self.getNextSample(self.myData) != 0:
+                return None
+        elif self.Stype == 'Event':
+            if self.getEvent(self.myData) != 0:
+                return None
+        else:
+            self.cmdId = self.acceptCommand(self.myData)
+            if self.cmdId <= 0:
+                return None
+        return self.schema.snapshot(self.myData)
+
+    def dispatch(self, sample):
+        """Hand a new sample to the queue and the callbacks. Called by the AsyncPoller."""
+        self.nread += 1
+        if self.queue is not None:
+            if self.queue.full():
+                self.ndropped += 1
+                if self.overflow == 'drop_newest':
+                    sample_to_queue = None
+                else:
+                    self.queue.get_nowait()
+                    sample_to_queue = sample
+            else:
+                sample_to_queue = sample
+            if sample_to_queue is not None:
+                self.queue.put_nowait(sample_to_queue)
+                if self.queue.qsize() > self.max_queued:
+                    self.max_queued = self.queue.qsize()
+
+        for callback in self.callbacks:
+            if asyncio.iscoroutinefunction(callback):
+                task = self.poller.loop.create_task(callback(sample))
+                self._tasks.add(task)
+                task.add_done_callback(self._callback_done)
+            else:
+                callback(sample)
+
+    def _callback_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.log.error('Error in a callback of %s', self.topic_name, exc_info=task.exception())
+
+    def start(self):
+        """Start receiving samples. Must be called from the event loop.
+
+        Done by next(), stream() and add_callback().
+        """
+        if self.poller is None:
+            self.poller = AsyncPoller.get(self.mgr)
+        self.poller.add(self)
+
+    def add_callback(self, callback):
+        """Call callback(sample) for every new sample. Must be called from the event loop.
+
+        callback can be a function or a coroutine function (scheduled as a task).
+        """
+        self.callbacks.append(callback)
+        self.start()
+
+    async def next(self, timeout=None):
+        """Wait for the next sample.
+
+        Parameters
+        ----------
+        timeout: float, opt
+            Maximum time to wait in seconds. Default: wait forever.
+
+        Returns
+        -------
+        TopicSample
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If no sample is received before timeout.
+        """
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.start()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def stream(self):
+        """Asynchronous iterator over the new samples."""
+        while True:
+            yield await self.next()
 
     async def run_Telem(self):
         while True:
@@ -506,13 +910,40 @@ class DDSSubscriberMain:
                 break
             await asyncio.sleep(self.tsleep)
 
+    def close(self):
+        """Stop receiving samples and give the SAL manager back to the pool."""
+        if self.poller is not None:
+            self.poller.remove(self)
+        REGISTRY.unregister(self)
+        release_manager(self.mgr, claim=self.topic_name)
+
 
 class DDSSubscriber(threading.Thread):
 
-    ''' Class to Subscribe to Telemetry, it could a Command (discouraged), Event or Telemetry'''
+    ''' Class to Subscribe to Telemetry, it could a Command (discouraged), Event or Telemetry
+
+    By default the thread reads at most one sample every tsleep. With drain=True
+    it reads all pending samples (up to max_drain, if given) before sleeping, so
+    a topic published faster than 1/tsleep does not fall behind.
+
+    With columnar=True the last nkeep samples are also stored in NumPy columns
+    (see ColumnarBuffer), available with to_arrays() and window().
+
+    If max_tsleep is given, the time between reads grows from tsleep up to
+    max_tsleep while the topic is idle and goes back to tsleep as soon as a
+    sample is received (see AdaptiveInterval).
+
+    Every sample is stored with a SampleTime: when it was received
+    (time.monotonic()) and sent (its private_sndStamp, if the topic has one).
+    age() gives the time since the last sample, getCurrent(max_age=...) ignores
+    stale data and latency holds the distribution of the send to receive
+    latencies (time.time() - private_sndStamp, meaningful only if the clocks of
+    the publisher and of this host agree).
+    '''
 
     def __init__(self, Device, topic, device_id=None, threadID='1', Stype='Telemetry',
-                 tsleep=0.01, timeout=3600, nkeep=100):
+                 tsleep=0.01, timeout=3600, nkeep=100, drain=False, max_drain=None,
+                 columnar=False, max_tsleep=None):
         threading.Thread.__init__(self)
         self.threadID = threadID
         self.Device = Device
@@ -522,21 +953,46 @@ class DDSSubscriber(threading.Thread):
         self.log = create_logger(name=self.Device)
 
         self.tsleep = tsleep
+        self.interval = AdaptiveInterval(tsleep, max_tsleep)
+        self.next_poll = 0.  # Used by DDSPoller
         self.Stype = Stype
         self.timeout = timeout
         self.nkeep = nkeep
+        self.drain = drain
+        self.max_drain = max_drain
         self.daemon = True
+        self._closing = threading.Event()
+
+        # Counters of samples read: in total, at the last wakeup and the most in one wakeup
+        self.nread = 0
+        self.last_read = 0
+        self.max_read = 0
+        self.read_time = LatencyHistogram()  # Time spent in each read_pending()
+        self.last_sample_time = None  # time.monotonic() of the last sample
+        self.latency = LatencyHistogram()  # From private_sndStamp to the read
 
         # Subscribe
         self.newTelem = False
         self.newEvent = False
+        self.newCommand = False
 
         self.getNextSample = None  # Method to get telemetry
         self.getEvent = None  # Method to get Event
         self.myData = None  # Method to get Commands
         self.acceptCommand = None  # Method to accept command
+        self.cmdId = None
+
+        self.schema = None  # Fields of the topic, to copy the samples
+        self.history = RingBuffer(self.nkeep)  # Keep only nkeep entries
+        self.times = RingBuffer(self.nkeep)  # SampleTime of each entry of history
+        self._has_sndstamp = False
+        self.new_sample = threading.Condition()  # Notified on every new sample
+        self.columnar = columnar
+        self.columns = None  # ColumnarBuffer, if columnar
+        self.callbacks = []  # Called with each new sample
 
         self.mgr = None  # SAL Manager
+        self.topic_name = topic_name(self.Device, self.topic, self.Stype)
 
         self.subscribe()
 
@@ -546,50 +1002,44 @@ class DDSSubscriber(threading.Thread):
         # self.mgr = SALPY_tcs.SAL_tcs()
         # The steps are:
         # - 'figure out' the SALPY_xxxx Device name
-        # - find the library pointer using globals()
-        # - create a mananger
+        # - get a (shared) manager from the pool, claiming the topic we read
 
-        SALPY_lib = import_module('SALPY_{}'.format(self.Device))
-
-        if self.device_id is None:
-            self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))()
-        else:
-            try:
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))(self.device_id)
-            except TypeError:
-                self.log.error('Could not initialize component {} '
-                               'with device id {}. Trying with no id.'.format(self.Device, self.device_id))
-                self.device_id = None
-                self.mgr = getattr(SALPY_lib, 'SAL_{}'.format(self.Device))()
+        self.mgr = get_manager(self.Device, self.device_id, claim=self.topic_name)
+        self.device_id = self.mgr.device_id
+        catalog = get_catalog(self.Device, self.mgr.SALPY_lib)
 
         if self.Stype == 'Telemetry':
-            self.myData = getattr(SALPY_lib, '{}_{}C'.format(self.Device, self.topic))()
-            self.mgr.salTelemetrySub("{}_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salTelemetrySub(self.topic_name)
             # Generic method to get for example: self.mgr.getNextSample_kernel_FK5Target
             self.getNextSample = getattr(self.mgr, "getNextSample_{}".format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
         elif self.Stype == 'Event':
-            self.myData = getattr(SALPY_lib, '{}_logevent_{}C'.format(self.Device, self.topic))()
-            self.mgr.salEvent("{}_logevent_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salEvent(self.topic_name)
             # Generic method to get for example: self.mgr.getEvent_startIntegration(event)
             self.getEvent = getattr(self.mgr, 'getEvent_{}'.format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
         elif self.Stype == 'Command':
             self.log.warning('This method is not intended to be used to listen to commands. '
                              'Unless you know what you are doing, you are probably looking for '
                              'DDSController instead.')
-            self.myData = getattr(SALPY_lib, '{}_command_{}C'.format(self.Device, self.topic))()
-            self.mgr.salProcessor("{}_command_{}".format(self.Device, self.topic))
+            self.myData = catalog.new_data(self.topic, self.Stype)
+            self.mgr.salProcessor(self.topic_name)
             # Generic method to get for example: self.mgr.acceptCommand_takeImages(event)
             self.acceptCommand = getattr(self.mgr, 'acceptCommand_{}'.format(self.topic))
-            self.log.debug("{} subscriber ready for Device:{} topic:{}".format(self.Stype,
-                                                                               self.Device, self.topic))
+            self.log.debug("%s subscriber ready for Device:%s topic:%s", self.Stype, self.Device, self.topic)
+
+        if self.myData is not None:
+            self.schema = get_schema(self.myData)
+            self._has_sndstamp = 'private_sndStamp' in self.schema.fields
+            if self.columnar:
+                self.columns = ColumnarBuffer(self.schema, self.nkeep)
+        REGISTRY.register(self, 'subscriber', device=self.Device, topic=self.topic_name,
+                          device_id=self.device_id)
 
     def run(self):
         ''' The run method for the threading'''
-        self.myDatalist = []
         if self.Stype == 'Telemetry':
             self.newTelem = False
             self.run_Telem()
@@ -603,81 +1053,482 @@ class DDSSubscriber(threading.Thread):
             raise ValueError("Stype=%s not defined\n" % self.Stype)
 
     def run_Telem(self):
-        while True:
-            retval = self.getNextSample(self.myData)
-            if retval == 0:
-                self.myDatalist.append(self.myData)
-                self.myDatalist = self.myDatalist[-self.nkeep:]  # Keep only nkeep entries
-                self.newTelem = True
-            time.sleep(self.tsleep)
+        while not self._closing.is_set():
+            nread = self.read_pending(self.max_drain if self.drain else 1)
+            self._closing.wait(self.interval.update(nread))
         return
 
     def run_Event(self):
-        while True:
-            retval = self.getEvent(self.myData)
-            if retval == 0:
-                self.myDatalist.append(self.myData)
-                self.myDatalist = self.myDatalist[-self.nkeep:]  # Keep only nkeep entries
-                self.newEvent = True
-            time.sleep(self.tsleep)
+        while not self._closing.is_set():
+            nread = self.read_pending(self.max_drain if self.drain else 1)
+            self._closing.wait(self.interval.update(nread))
         return
 
     def run_Command(self):
-        while True:
+        while not self._closing.is_set():
+            nread = self.read_pending(self.max_drain if self.drain else 1)
+            self._closing.wait(self.interval.update(nread))
+        return
+
+    def read_pending(self, max_samples=None):
+        """Read samples until there are no more pending, or max_samples were read.
+
+        Parameters
+        ----------
+        max_samples: int, opt
+            Maximum number of samples to read. Default: no limit.
+
+        Returns
+        -------
+        int
+            Number of samples read.
+        """
+        start = time.perf_counter()
+        nread = 0
+        while max_samples is None or nread < max_samples:
+            if self.poll() == 0:
+                break
+            nread += 1
+        self.nread += nread
+        self.last_read = nread
+        if nread > self.max_read:
+            self.max_read = nread
+        self.read_time.add(time.perf_counter() - start)
+        return nread
+
+    def poll(self):
+        """Read a new sample, if there is one, and store it.
+
+        This is what the thread does every tsleep. It can also be called from
+        somewhere else (e.g. a DDSPoller) as long as the thread is not started.
+
+        Returns
+        -------
+        int
+            Number of samples read (0 or 1).
+        """
+        if self.Stype == 'Telemetry':
+            if self.getNextSample(self.myData) != 0:
+                return 0
+        elif self.Stype == 'Event':
+            if self.getEvent(self.myData) != 0:
+                return 0
+        else:
             self.cmdId = self.acceptCommand(self.myData)
-            if self.cmdId > 0:
-                self.myDatalist.append(self.myData)
-                self.myDatalist = self.myDatalist[-self.nkeep:]  # Keep only nkeep entries
+            if self.cmdId <= 0:
+                return 0
+
+        # Keep a copy, self.myData is overwritten by the next read
+        sample = self.schema.snapshot(self.myData)
+        received = self.last_sample_time = time.monotonic()
+        sent = self.myData.private_sndStamp if self._has_sndstamp else None
+        if sent:
+            now = time.time()
+            if now >= sent:
+                self.latency.add(now - sent)
+        else:
+            sent = None
+        if self.columns is not None:
+            self.columns.append(sample, received)
+        with self.new_sample:
+            # Under the lock, so that history and times stay aligned for getLast(k, times=True)
+            self.history.append(sample)
+            self.times.append(SampleTime(received, sent))
+            if self.Stype == 'Telemetry':
+                self.newTelem = True
+            elif self.Stype == 'Event':
+                self.newEvent = True
+            else:
                 self.newCommand = True
-            time.sleep(self.tsleep)
-        return
+            self.new_sample.notify_all()
+        for callback in self.callbacks:
+            try:
+                callback(sample)
+            except Exception:
+                self.log.exception('Error in a callback of %s', self.topic_name)
+        return 1
+
+    def add_callback(self, callback):
+        """Call callback(sample) every time a new sample is received.
+
+        sample is a TopicSample, an immutable copy of the received data.
+        """
+        self.callbacks.append(callback)
+
+    def stats(self):
+        """Return the counters of samples read and the statistics of the reads.
+
+        Includes the statistics of the read interval (npolls, nempty, ...,
+        see AdaptiveInterval.stats), the most samples read in one wakeup
+        (max_read, the drain depth), the time spent reading and the time since
+        the last sample (None if none was received) and the send to receive
+        latencies.
+        """
+        stats = self.interval.stats()
+        stats.update(read=self.nread,
+                     last_read=self.last_read,
+                     max_read=self.max_read,
+                     history=len(self.history),
+                     seconds_since_last_sample=self.age(),
+                     read_time=self.read_time.stats(),
+                     latency=self.latency.stats())
+        return stats
+
+    def age(self):
+        """Return the time (seconds) since the last sample was received, None if none was."""
+        if self.last_sample_time is None:
+            return None
+        return time.monotonic() - self.last_sample_time
+
+    @property
+    def myDatalist(self):
+        """List of the last nkeep samples, oldest first (a copy of history)."""
+        return self.history.snapshot()
+
+    def getLast(self, k, times=False):
+        """Return the k most recent samples, oldest first.
+
+        With times=True return a list of (sample, SampleTime) instead.
+        """
+        if not times:
+            return self.history.last(k)
+        with self.new_sample:
+            return list(zip(self.history.last(k), self.times.last(k)))
+
+    def getSince(self, seq):
+        """Return the sequence number of the last sample and the samples received after seq.
+
+        See RingBuffer.since.
+        """
+        return self.history.since(seq)
+
+    def to_arrays(self, last=None):
+        """Return the last samples as NumPy arrays, see ColumnarBuffer.to_arrays.
+
+        Requires columnar=True.
+        """
+        if self.columns is None:
+            raise RuntimeError('{} is not stored in columns, use columnar=True.'.format(self.topic_name))
+        return self.columns.to_arrays(last)
+
+    def window(self, t0, t1, field='rcv_time'):
+        """Return the samples with t0 <= field < t1 as NumPy arrays, see ColumnarBuffer.window.
+
+        rcv_time is the time.monotonic() of the reception, as in SampleTime.received.
+
+        Requires columnar=True.
+        """
+        if self.columns is None:
+            raise RuntimeError('{} is not stored in columns, use columnar=True.'.format(self.topic_name))
+        return self.columns.window(t0, t1, field)
+
+    def getCurrent(self, max_age=None):
+        """Return the last sample received.
 
-    def getCurrent(self):
-        if len(self.myDatalist) > 0:
-            Current = self.myDatalist[-1]
+        Parameters
+        ----------
+        max_age: float, opt
+            Return None instead if the last sample was received more than
+            max_age seconds ago, or if none was received. Default: return the
+            last sample however old it is (the empty struct if none was received).
+        """
+        if max_age is not None:
+            age = self.age()
+            if age is None or age > max_age:
+                self.log.debug('No sample of %s newer than %ss (age: %s)', self.topic, max_age, age)
+                return None
+        if len(self.history) > 0:
+            Current = self.history.latest()
             self.newTelem = False
             self.newEvent = False
         else:
             # Current = None
             # For now we're passing the empty value of the object, we might want to revise this in the future
-            self.log.warning("No value received for: '{}' yet, "
-                             "sending empty object anyway".format(self.topic))
+            self.log.warning("No value received for: '%s' yet, sending empty object anyway", self.topic)
             Current = self.myData
         return Current
 
-    def getCurrentTelemetry(self):
-        return self.getCurrent()
+    def getCurrentTelemetry(self, max_age=None):
+        return self.getCurrent(max_age)
 
-    def getCurrentEvent(self):
-        return self.getCurrent()
+    def getCurrentEvent(self, max_age=None):
+        return self.getCurrent(max_age)
 
-    def getCurrentCommand(self):
-        return self.getCurrent()
+    def getCurrentCommand(self, max_age=None):
+        return self.getCurrent(max_age)
 
     def waitEvent(self, tsleep=None, timeout=None):
 
-        """ Loop for waiting for new event """
-        if not tsleep:
-            tsleep = self.tsleep
+        """ Wait for a new event (blocks until the reader notifies it, no polling).
+
+        tsleep is no longer used and only kept for backward compatibility.
+        """
         if not timeout:
             timeout = self.timeout
 
-        t0 = time.time()
-        while not self.newEvent:
-            sys.stdout.flush()
-            sys.stdout.write("Wating for %s event.. [%s]" % (self.topic, spinner.next()))
-            sys.stdout.write('\r')
-            if time.time() - t0 > timeout:
-                self.log.warning("Timeout reading for Event %s" % self.topic)
+        with self.new_sample:
+            if not self.new_sample.wait_for(lambda: self.newEvent, timeout):
+                self.log.warning("Timeout reading for Event %s", self.topic)
                 self.newEvent = False
-                break
-            time.sleep(tsleep)
         return self.newEvent
 
+    def wait_for(self, predicate=None, timeout=None):
+        """Wait for a new sample for which predicate(sample) is True.
+
+        The predicate is only evaluated on the samples received after the call,
+        each of them once, as they arrive.
+
+        Parameters
+        ----------
+        predicate: callable, opt
+            Function of a sample returning a bool. Default: accept any sample.
+        timeout: float, opt
+            Maximum time to wait in seconds. Default: wait forever.
+
+        Returns
+        -------
+        TopicSample or None
+            The first matching sample, None if timed out.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.new_sample:
+            seq = self.history.seq
+            while True:
+                seq, samples = self.history.since(seq)
+                for sample in samples:
+                    if predicate is None or predicate(sample):
+                        return sample
+                if deadline is None:
+                    self.new_sample.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self.new_sample.wait(remaining)
+
     def resetEvent(self):
         ''' Simple function to set it back'''
         self.newEvent = False
 
+    def close(self):
+        """Stop the thread (if started) and give the SAL manager back to the pool."""
+        self._closing.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        REGISTRY.unregister(self)
+        release_manager(self.mgr, claim=self.topic_name)
+
+
+class DDSPoller(threading.Thread):
+    """Read many topics in a single thread.
+
+    Instead of starting one DDSSubscriber thread per topic, the subscribers are
+    added to a DDSPoller (and not started). The poller loops over all of them,
+    reading every pending sample of each topic (up to max_samples per topic
+    per loop so a busy topic cannot starve the others). The number of threads
+    is therefore independent of the number of topics.
+
+    Each topic is read according to the interval of its subscriber (tsleep,
+    growing up to max_tsleep while idle, see DDSSubscriber), so idle topics
+    cost fewer reads than busy ones. A topic that still had data after
+    max_samples reads is read again right away.
+
+    Attributes:
+        subscribers: Dictionary of DDSSubscriber keyed by (topic_name, device_id).
+        tsleep: Read interval of the topics added with add_topic().
+        max_tsleep: Longest read interval of the topics added with add_topic().
+        max_samples: Maximum number of samples read from one topic per loop.
+    """
+    def __init__(self, tsleep=0.01, max_samples=100, max_tsleep=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.tsleep = tsleep
+        self.max_tsleep = max_tsleep
+        self.max_samples = max_samples
+        self.subscribers = {}
+        self.shutdown_flag = threading.Event()
+        self.log = create_logger(name=__name__)
+        self._lock = threading.Lock()
+        self._readers = []
+        self._wakeup = threading.Event()  # Set to stop sleeping (new topic or stop)
+
+    def add_subscriber(self, subscriber, callback=None):
+        """Add a DDSSubscriber to the loop. The subscriber must not be started.
+
+        Parameters
+        ----------
+        subscriber: DDSSubscriber
+        callback: callable, opt
+            Called with each new sample of this topic.
+
+        Returns
+        -------
+        DDSSubscriber
+        """
+        if subscriber.is_alive():
+            raise RuntimeError('{} is already read by its own thread.'.format(subscriber.topic_name))
+        if callback is not None:
+            subscriber.add_callback(callback)
+        subscriber.next_poll = 0.
+        with self._lock:
+            self.subscribers[(subscriber.topic_name, subscriber.device_id)] = subscriber
+            self._readers = list(self.subscribers.values())
+        self._wakeup.set()
+        return subscriber
+
+    def add_topic(self, Device, topic, Stype='Telemetry', device_id=None, nkeep=100, callback=None):
+        """Subscribe to a topic and add it to the loop.
+
+        Returns
+        -------
+        DDSSubscriber
+        """
+        subscriber = DDSSubscriber(Device, topic, device_id=device_id, Stype=Stype,
+                                   threadID='{}_{}_{}'.format(Device, Stype, topic),
+                                   tsleep=self.tsleep, max_tsleep=self.max_tsleep, nkeep=nkeep)
+        return self.add_subscriber(subscriber, callback)
+
+    def remove_subscriber(self, subscriber):
+        with self._lock:
+            self.subscribers.pop((subscriber.topic_name, subscriber.device_id), None)
+            self._readers = list(self.subscribers.values())
+
+    def poll(self):
+        """Read the pending samples of the topics that are due.
+
+        Returns
+        -------
+        float
+            Time (time.monotonic()) at which the next topic is due.
+        """
+        now = time.monotonic()
+        next_poll = now + self.tsleep if len(self._readers) == 0 else None
+        for subscriber in self._readers:
+            if subscriber.next_poll <= now:
+                try:
+                    nread = subscriber.read_pending(self.max_samples)
+                except Exception:
+                    # Do not let one topic stop the reading of the others
+                    self.log.exception('Error while reading %s', subscriber.topic_name)
+                    nread = 0
+                if nread >= self.max_samples:
+                    subscriber.next_poll = now
+                else:
+                    subscriber.next_poll = now + subscriber.interval.update(nread)
+            if next_poll is None or subscriber.next_poll < next_poll:
+                next_poll = subscriber.next_poll
+        return next_poll
+
+    def run(self):
+        self.log.debug('Polling %i topics...', len(self.subscribers))
+        while not self.shutdown_flag.is_set():
+            self._wakeup.clear()
+            try:
+                next_poll = self.poll()
+            except Exception:
+                self.log.exception('Error while polling topics.')
+                next_poll = time.monotonic() + self.tsleep
+            wait = next_poll - time.monotonic()
+            if wait > 0:
+                self._wakeup.wait(wait)
+        self.log.debug('Stopping...')
+
+    def stop(self):
+        self.shutdown_flag.set()
+        self._wakeup.set()
+
+    def stats(self):
+        """Return {topic_name: DDSSubscriber.stats()} for all the topics."""
+        return {subscriber.topic_name: subscriber.stats() for subscriber in self._readers}
+
+
+class CommandResponse:
+    """The acks received for a command sent by DDSSend.
+
+    Threads can block on new acks with wait(), asyncio code can use future
+    (resolved with the final ack) or get every ack with a listener queue.
+
+    Attributes:
+        cmd: Name of the command.
+        cmdid: Command id.
+        acks: List of the (ack, error, result) received, oldest first.
+        future: concurrent.futures.Future resolved with the final ack.
+        issued: Time (time.monotonic()) the command was sent.
+    """
+    def __init__(self, cmd, cmdid):
+        self.cmd = cmd
+        self.cmdid = cmdid
+        self.acks = []
+        self.future = concurrent.futures.Future()
+        self.issued = time.monotonic()
+        self.new_ack = threading.Condition()
+        self._listeners = []  # (loop, asyncio.Queue)
+
+    def __getitem__(self, item):
+        # Backward compatibility with the {'cmd': ..., 'ack': [...]} dictionaries
+        if item == 'cmd':
+            return self.cmd
+        elif item == 'ack':
+            return self.acks
+        raise KeyError(item)
+
+    @staticmethod
+    def is_final(ack):
+        """Any ack that is not SAL__CMD_ACK or SAL__CMD_INPROGRESS is final."""
+        return ack[0] != SAL__CMD_ACK and ack[0] != SAL__CMD_INPROGRESS
+
+    @property
+    def last_ack(self):
+        return self.acks[-1] if len(self.acks) > 0 else None
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def add_ack(self, ack, error, result):
+        """Store a new ack and wake up whoever is waiting for it."""
+        ack = (ack, error, result)
+        with self.new_ack:
+            self.acks.append(ack)
+            self.new_ack.notify_all()
+            listeners = []
+            for loop, queue in self._listeners:
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, ack)
+                except RuntimeError:
+                    LOGGER.warning('Event loop closed, dropping a listener of %s (%s)', self.cmd, self.cmdid)
+                else:
+                    listeners.append((loop, queue))
+            self._listeners = listeners
+        if self.is_final(ack) and not self.future.done():
+            self.future.set_result(ack)
+
+    def wait(self, predicate, timeout=None):
+        """Wait until predicate(last ack) is True.
+
+        Returns
+        -------
+        tuple or None
+            The last ack, None if timed out.
+        """
+        with self.new_ack:
+            if self.new_ack.wait_for(lambda: len(self.acks) > 0 and predicate(self.acks[-1]), timeout):
+                return self.acks[-1]
+        return None
+
+    def add_listener(self, loop):
+        """Return an asyncio.Queue receiving all the acks (including the ones already received)."""
+        queue = asyncio.Queue()
+        with self.new_ack:
+            for ack in self.acks:
+                queue.put_nowait(ack)
+            self._listeners.append((loop, queue))
+        return queue
+
+    def remove_listener(self, queue):
+        with self.new_ack:
+            self._listeners = [(loop, _queue) for loop, _queue in self._listeners if _queue is not queue]
+
 
 class DDSSend(threading.Thread):
     """
@@ -685,37 +1536,54 @@ class DDSSend(threading.Thread):
     In the case of a command, the class instance cannot be
     re-used.
     For Events/Telemetry, the same object can be re-used for a given Device,
+
+    The responses to the commands are kept in a ResponseTable: completed
+    commands are forgotten max_response_age seconds after their final ack (or
+    after they were last looked up), or earlier when more than max_responses
+    commands are kept.
+
+    Set log_fields to False (on the class or an instance) to never log the
+    value of each field of the commands, events and telemetry at debug level.
+    The TopicPublishers take the value of log_fields when they are created.
     """
-    def __init__(self, Device, device_id=None, sleeptime=0.1, timeout=30):
+    log_fields = True
+
+    def __init__(self, Device, device_id=None, sleeptime=0.1, timeout=30, max_sleeptime=None,
+                 max_responses=10000, max_response_age=600.):
         threading.Thread.__init__(self)
         self.daemon = True
         self.sleeptime = sleeptime
+        # Time between reads of the acks, grows up to max_sleeptime while idle
+        self.interval = AdaptiveInterval(sleeptime, max_sleeptime)
         self.timeout = timeout
         self.Device = Device
         self.device_id = device_id
         self.cmd = ''
         self.log = create_logger(name=self.Device)
-        self.log.debug("Loading Device: {}".format(self.Device))
+        self.log.debug("Loading Device: %s", self.Device)
         self.subscribed = []
-        self.cmd_responses = {}
-
-        # Load SALPY_lib into the class
-        self.SALPY_lib = import_module('SALPY_{}'.format(self.Device))
-        if device_id is None:
-            self.manager = getattr(self.SALPY_lib, 'SAL_{}'.format(self.Device))()
-        else:
-            try:
-                self.manager = getattr(self.SALPY_lib, 'SAL_{}'.format(self.Device))(device_id)
-            except TypeError:
-                self.log.error('Could not initialize component {} '
-                               'with device id {}. Trying with no id.'.format(self.Device, device_id))
-                self.device_id = None
-                self.manager = getattr(self.SALPY_lib, 'SAL_{}'.format(self.Device))()
-
-        cmd_name = "{}_command_{}".format(self.Device, 'enable')
-        self.manager.salProcessor(cmd_name)
-        self.subscribed.append(cmd_name)
-        self.ack = getattr(self.SALPY_lib, '{}_ackcmdC'.format(self.Device))()
+        self.cmd_responses = ResponseTable(max_responses, max_response_age)
+        self.publishers = {}  # TopicPublisher by (stype, topic)
+        self.ncommands = 0  # Commands sent
+        self.nacks = 0  # Acks read
+        self.command_latency = LatencyHistogram()  # From issueCommand to the final ack
+        self.ack_readers = {}  # getResponse_<cmd> for every command sent, keyed by cmd
+        self._ack_readers = ()  # The same, safe to iterate from run()
+        # Held while issuing a command and while reading acks, so that the
+        # CommandResponse always exists before its first ack is read.
+        self._ack_lock = threading.Lock()
+
+        # Get a shared manager, we own the reader of the command acks
+        self.ack_topic = '{}_ackcmd'.format(self.Device)
+        self.manager = get_manager(self.Device, device_id, claim=self.ack_topic)
+        self.device_id = self.manager.device_id
+        self.SALPY_lib = self.manager.SALPY_lib
+        self.catalog = get_catalog(self.Device, self.SALPY_lib)
+
+        self.ack = self.catalog.ack_class()
+        self._closing = threading.Event()
+        self._wakeup = threading.Event()  # Set to read the acks now (new command sent, closing)
+        REGISTRY.register(self, 'sender', device=self.Device, device_id=self.device_id)
 
     def run(self):
         """
@@ -725,19 +1593,43 @@ class DDSSend(threading.Thread):
         -------
         None
         """
-        while True:
+        while not self._closing.is_set():
+            self._wakeup.clear()
+            nread = 0
             if len(self.cmd_responses) > 0:
-                response = self.manager.getResponse_enable(self.ack)
-                # Only store listed commands.
-                if response in self.cmd_responses:
-                    self.cmd_responses[response]['ack'].append((self.ack.ack,
-                                                                self.ack.error, self.ack.result))
-                    self.cmd_responses[response]['event'].set()
+                with self._ack_lock:
+                    try:
+                        nread = self.read_acks()
+                    except Exception:
+                        # Keep polling, the thread is the only reader of the acks
+                        self.log.exception('Error while reading the acks of %s', self.Device)
+
+            self._wakeup.wait(self.interval.update(nread))
 
-            time.sleep(self.sleeptime)
-            # Clear all events in cmd_responses
-            for cmd_id in self.cmd_responses:
-                self.cmd_responses[cmd_id]['event'].clear()
+    def read_acks(self):
+        """Read all the pending acks, of every command sent, and hand them to their CommandResponse.
+
+        Returns
+        -------
+        int
+            Number of acks read.
+        """
+        nread = 0
+        for getResponse in self._ack_readers:
+            while True:
+                response = getResponse(self.ack)
+                if response <= 0:
+                    break
+                nread += 1
+                # Only store listed commands.
+                cmd_response = self.cmd_responses.get(response)
+                if cmd_response is not None:
+                    cmd_response.add_ack(self.ack.ack, self.ack.error, self.ack.result)
+                    if cmd_response.done:
+                        self.cmd_responses.mark_done(response)
+                        self.command_latency.add(time.monotonic() - cmd_response.issued)
+        self.nacks += nread
+        return nread
 
     def send_Command(self, cmd, **kwargs):
         """
@@ -765,19 +1657,22 @@ class DDSSend(threading.Thread):
         # 1) issueCommand
         # 2) waitForCompletion -- this can be run separately
 
-        self.log.debug("Issuing command: {}".format(cmd))
+        self.log.debug("Issuing command: %s", cmd)
         cmd_name = "{}_command_{}".format(self.Device, cmd)
         if cmd_name not in self.subscribed:
             self.manager.salProcessor(cmd_name)
             self.subscribed.append(cmd_name)
-        cmdid = getattr(self.manager, 'issueCommand_{}'.format(cmd))(data)
-
-        # Note that if SAL reuses a cmdid, it will be overwritten here.
-        # Todo: keep track of size of cmd_responses and delete older entries...
-        self.cmd_responses[cmdid] = {'cmd': cmd,
-                                     'ack': [],
-                                     'event': threading.Event()}
-        self.cmd_responses[cmdid]['event'].clear()
+        if cmd not in self.ack_readers:
+            self.ack_readers[cmd] = getattr(self.manager, 'getResponse_{}'.format(cmd))
+            self._ack_readers = tuple(self.ack_readers.values())
+        with self._ack_lock:
+            cmdid = getattr(self.manager, 'issueCommand_{}'.format(cmd))(data)
+            # Note that if SAL reuses a cmdid, it will be overwritten here.
+            self.cmd_responses[cmdid] = CommandResponse(cmd, cmdid)
+            self.ncommands += 1
+        # Expect acks soon, read them at the fastest rate, starting now
+        self.interval.reset()
+        self._wakeup.set()
 
         if wait_command:
             retval = self.waitForCompletion(cmdid, timeout)
@@ -805,32 +1700,22 @@ class DDSSend(threading.Thread):
             cmdid, ack result of command (empty if timed out)
         """
         # Do some basic sanity check
-        if cmdid not in self.cmd_responses:  # make sure we known this command
-            IOError('Unknown command {}'.format(cmdid))
-        elif len(self.cmd_responses[cmdid]['ack']) > 0 and (
-                self.cmd_responses[cmdid]['ack'][-1][0] != SAL__CMD_ACK and
-                self.cmd_responses[cmdid]['ack'][-1][0] != SAL__CMD_INPROGRESS):
-            ack = self.cmd_responses[cmdid]['ack'][-1]
+        response = self.cmd_responses.get(cmdid)
+        if response is None:  # make sure we known this command (or it was not forgotten)
+            raise IOError('Unknown command {}'.format(cmdid))
+        if response.done:
+            ack = response.last_ack
             self.log.debug('Command already completed with ack %i:%i:%s', ack[0], ack[1], ack[2])
             return cmdid, ack
 
         tout = timeout if timeout is not None else self.timeout
-        self.log.debug("Wait %f sec for completion of cmd: %s:[%s]", tout,
-                       self.cmd_responses[cmdid]['cmd'], cmdid)
+        self.log.debug("Wait %f sec for completion of cmd: %s:[%s]", tout, response.cmd, cmdid)
         # retval = getattr(self.manager, 'waitForCompletion_{}'.format(cmd))(cmdid, tout)
-        start_time = time.time()
-        while time.time()-start_time < tout:
-            got_response = self.cmd_responses[cmdid]['event'].wait(tout)
-            self.cmd_responses[cmdid]['event'].clear()
-            if got_response:
-                ack = self.cmd_responses[cmdid]['ack'][-1]
-                if ack[0] != SAL__CMD_ACK and ack[0] != SAL__CMD_INPROGRESS:
-                    self.log.debug('Command completed with ack %i:%i:%s', ack[0], ack[1], ack[2])
-                    return cmdid, ack
-                else:
-                    self.log.debug('Command not complete. Received ack %i:%i:%s', ack[0], ack[1], ack[2])
-                    # return -cmdid, ack
-        self.log.debug('%s:[%i]: Timed out', self.cmd_responses[cmdid]['cmd'], cmdid)
+        ack = response.wait(CommandResponse.is_final, tout)
+        if ack is not None:
+            self.log.debug('Command completed with ack %i:%i:%s', ack[0], ack[1], ack[2])
+            return cmdid, ack
+        self.log.debug('%s:[%i]: Timed out', response.cmd, cmdid)
         return -1, ()
 
     def waitForInProgress(self, cmdid, timeout=None):
@@ -853,37 +1738,67 @@ class DDSSend(threading.Thread):
             command is not complete but received ack. -1 if times out), the ack result or empty if timed out.
         """
         # Do some basic sanity check
-        if cmdid not in self.cmd_responses:  # make sure we known this command
-            IOError('Unknown command {}'.format(cmdid))
-        elif len(self.cmd_responses[cmdid]['ack']) > 0 and (
-                self.cmd_responses[cmdid]['ack'][-1][0] != SAL__CMD_ACK):
-            ack = self.cmd_responses[cmdid]['ack'][-1]
-            self.log.debug('Command already in progress with ack %i:%i:%s', ack[0], ack[1], ack[2])
-            return cmdid, ack
+        response = self.cmd_responses.get(cmdid)
+        if response is None:  # make sure we known this command (or it was not forgotten)
+            raise IOError('Unknown command {}'.format(cmdid))
 
         tout = timeout if timeout is not None else self.timeout
-        self.log.debug("Wait %f sec for in progress of cmd: %s:[%s]", tout,
-                       self.cmd_responses[cmdid]['cmd'], cmdid)
+        self.log.debug("Wait %f sec for in progress of cmd: %s:[%s]", tout, response.cmd, cmdid)
         # retval = getattr(self.manager, 'waitForCompletion_{}'.format(cmd))(cmdid, tout)
-        start_time = time.time()
-        while time.time()-start_time < tout:
-            got_response = self.cmd_responses[cmdid]['event'].wait(tout)
-            self.cmd_responses[cmdid]['event'].clear()
-            if got_response:
-                ack = self.cmd_responses[cmdid]['ack'][-1]
-                if ack[0] != SAL__CMD_ACK:
-                    self.log.debug('Command in progress with ack %i:%i:%s', ack[0], ack[1], ack[2])
-                    return cmdid, ack
-                else:
-                    self.log.debug('Waiting for command to start. Received ack %i:%i:%s',
-                                   ack[0], ack[1], ack[2])
-                    # return -cmdid, ack
-        self.log.debug('%s:[%i]: Timed out', self.cmd_responses[cmdid]['cmd'], cmdid)
+        ack = response.wait(lambda _ack: _ack[0] != SAL__CMD_ACK, tout)
+        if ack is not None:
+            self.log.debug('Command in progress with ack %i:%i:%s', ack[0], ack[1], ack[2])
+            return cmdid, ack
+        self.log.debug('%s:[%i]: Timed out', response.cmd, cmdid)
         return -1, ()
 
+    def send_command_async(self, cmd, **kwargs):
+        """Send a Command without blocking.
+
+        Parameters
+        ----------
+        cmd: str
+        kwargs: dict
+            Parameters of the command.
+
+        Returns
+        -------
+        int, Future
+            cmdid and a future resolved with the final ack (ack, error, result).
+            The future is an asyncio.Future when called from a running event
+            loop, a concurrent.futures.Future otherwise. It is never resolved
+            if no final ack is received, use a timeout.
+        """
+        kwargs.pop('wait_command', None)
+        cmdid, _ = self.send_Command(cmd, **kwargs)
+        future = self.cmd_responses.get(cmdid).future
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return cmdid, future
+        return cmdid, asyncio.wrap_future(future, loop=loop)
+
+    async def ack_stream(self, cmdid):
+        """Asynchronous iterator over the acks of a command, until the final one.
+
+        Acks received before the call are included.
+        """
+        response = self.cmd_responses.get(cmdid)
+        if response is None:  # make sure we known this command (or it was not forgotten)
+            raise IOError('Unknown command {}'.format(cmdid))
+        queue = response.add_listener(asyncio.get_running_loop())
+        try:
+            while True:
+                ack = await queue.get()
+                yield ack
+                if CommandResponse.is_final(ack):
+                    break
+        finally:
+            response.remove_listener(queue)
+
     def ackCommand(self, cmd, cmdId):
         """ Just send the ACK for a command, it need the cmdId as input"""
-        self.log.debug("Sending ACK for Id: {} for Command: {}".format(cmdId, cmd))
+        self.log.debug("Sending ACK for Id: %s for Command: %s", cmdId, cmd)
         self.manager.salProcessor("{}_command_{}".format(self.Device, cmd))
         ackCommand = getattr(self.manager, 'ackCommand_{}'.format(cmd))
         ackCommand(cmdId, SAL__CMD_COMPLETE, 0, "Done : OK")
@@ -892,14 +1807,14 @@ class DDSSend(threading.Thread):
         mgr = self.manager
         mgr.salProcessor("{}_command_{}".format(self.Device, cmd))
         acceptCommand = getattr(mgr, 'acceptCommand_{}'.format(cmd))
-        myData = getattr(self.SALPY_lib, '{}_command_{}C'.format(self.Device, cmd))()
+        myData = self.catalog.new_data(cmd, 'Command')
         while True:
             cmdId = acceptCommand(myData)
             if cmdId > 0:
                 time.sleep(1)
                 break
         cmdId = acceptCommand(myData)
-        self.log.debug("Accepting cmdId: {} for Command: {}".format(cmdId, cmd))
+        self.log.debug("Accepting cmdId: %s for Command: %s", cmdId, cmd)
         return cmdId
 
     def send_Event(self, event, **kwargs):
@@ -914,19 +1829,13 @@ class DDSSend(threading.Thread):
 
         priority = kwargs.get('priority', 1)
 
-        data = self.get_event_data(event, **kwargs)
+        publisher = self.event_publisher(event)
+        data = publisher.make_data(**kwargs)
 
-        # Get the logEvent object to send myData
+        self.log.debug("Sending Event: %s", event)
+        publisher.publish(data, priority)
 
-        event_name = "{}_logevent_{}".format(self.Device, event)
-        if event_name not in self.subscribed:
-            self.manager.salEvent(event_name)
-            self.subscribed.append(event_name)
-
-        self.log.debug("Sending Event: {}".format(event))
-        getattr(self.manager, 'logEvent_{}'.format(event))(data, priority)
-
-        self.log.debug("Done: {}".format(event))
+        self.log.debug("Done: %s", event)
 
     def send_Telemetry(self, telemetry, **kwargs):
         """
@@ -938,39 +1847,117 @@ class DDSSend(threading.Thread):
         kwargs: dict
         """
 
-        # Get the myData object
-        data = self.get_telemetry_data(telemetry, **kwargs)
+        publisher = self.telemetry_publisher(telemetry)
+        data = publisher.make_data(**kwargs)
 
-        # Make it visible outside
-        telemetry_name = "{}_{}".format(self.Device, telemetry)
+        self.log.debug("Sending Telemetry: %s", telemetry)
+        publisher.publish(data)
+
+    def publish_many(self, topic, rows, stype='Telemetry', fields=None, rate=None):
+        """
+        Publish many samples of a Telemetry (or Event) topic.
+
+        Parameters
+        ----------
+        topic: str
+        rows: iterable
+            dictionaries, tuples or a NumPy structured array, see TopicPublisher.publish_many.
+        stype: str
+            'Telemetry' or 'Event'.
+        fields: list
+            Names of the fields of tuple rows, required with tuple rows.
+        rate: float, opt
+            Maximum number of samples per second.
+
+        Returns
+        -------
+        int
+            Number of samples published.
+        """
+        publisher = self.get_publisher(topic, stype)
+        self.log.debug("Sending many %s: %s", stype, topic)
+        return publisher.publish_many(rows, fields=fields, rate=rate)
+
+    def telemetry_publisher(self, telemetry):
+        """Return the (cached) TopicPublisher of a Telemetry topic.
 
-        if telemetry_name not in self.subscribed:
-            self.manager.salTelemetryPub(telemetry_name)
-            self.subscribed.append(telemetry_name)
+        Parameters
+        ----------
+        telemetry: str
+            Name of the topic (e.g. mountStatus).
 
-        self.log.debug("Sending Telemetry: {}".format(telemetry))
-        getattr(self.manager, 'putSample_{}'.format(telemetry))(data)
+        Returns
+        -------
+        TopicPublisher
+        """
+        return self.get_publisher(telemetry, 'Telemetry')
+
+    def event_publisher(self, event, priority=None):
+        """Return the (cached) TopicPublisher of an Event, see telemetry_publisher().
+
+        If given, priority becomes the default priority of the Event.
+        """
+        publisher = self.get_publisher(event, 'Event')
+        if priority is not None:
+            publisher.priority = priority
+        return publisher
+
+    def get_publisher(self, topic, stype):
+        publisher = self.publishers.get((stype, topic))
+        if publisher is None:
+            publisher = TopicPublisher(self.manager, self.Device, topic, stype)
+            publisher.log_fields = self.log_fields
+            self.publishers[(stype, topic)] = publisher
+            self.subscribed.append(publisher.name)
+        return publisher
+
+    def stats(self):
+        """Return the counters of commands and acks, the command latencies and the response table."""
+        return {'commands': self.ncommands,
+                'acks': self.nacks,
+                'command_latency': self.command_latency.stats(),
+                'responses': self.cmd_responses.stats(),
+                'interval': self.interval.stats()}
+
+    def close(self):
+        """Stop reading the acks and give the SAL manager back to the pool."""
+        self._closing.set()
+        self._wakeup.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        for publisher in self.publishers.values():
+            publisher.close()
+        REGISTRY.unregister(self)
+        release_manager(self.manager, claim=self.ack_topic)
 
     def get_cmd_data(self, cmd, **kwargs):
-        return self.get_data('{}_command_{}C'.format(self.Device, cmd), **kwargs)
+        info = self.catalog.get(cmd, 'Command')
+        return self.set_fields(info.new_data(), info.name, **kwargs)
 
     def get_event_data(self, event, **kwargs):
-        return self.get_data('{}_logevent_{}C'.format(self.Device, event), **kwargs)
+        info = self.catalog.get(event, 'Event')
+        return self.set_fields(info.new_data(), info.name, **kwargs)
 
     def get_telemetry_data(self, telemetry, **kwargs):
-        return self.get_data('{}_{}C'.format(self.Device, telemetry), **kwargs)
+        info = self.catalog.get(telemetry, 'Telemetry')
+        return self.set_fields(info.new_data(), info.name, **kwargs)
 
     def get_data(self, name, **kwargs):
         """ Updating myData with kwargs """
-        data = getattr(self.SALPY_lib, name)()
+        return self.set_fields(getattr(self.SALPY_lib, name)(), name, **kwargs)
 
-        for key in kwargs:
+    def set_fields(self, data, name, **kwargs):
+        """Set the fields of a struct from kwargs, unknown fields are skipped."""
+        log_fields = self.log_fields and self.log.isEnabledFor(logging.DEBUG)
+
+        for key, value in kwargs.items():
             try:
-                setattr(data, key, kwargs.get(key))
+                setattr(data, key, value)
             except AttributeError:
-                self.log.warning('No {} in {}() [skipping]'.format(key, name))
+                self.log.warning('No %s in %s() [skipping]', key, name)
             else:
-                self.log.debug('{} = {}'.format(key, kwargs.get(key)))
+                if log_fields:
+                    self.log.debug('%s = %s', key, value)
 
         return data
 
@@ -979,73 +1966,110 @@ class DDSSubscriberContainer:
     """
     This utility class will subscribe to all or a specific event from a specified controller
     and provide high-level object-oriented access to the underlying data.
+
+    Every sample read is also stored in cache, a LatestValueCache keyed by
+    full topic name (e.g. scheduler_logevent_target), so that
+    changed_since(version) returns only the topics and fields that changed.
+    A cache can be shared by several containers (e.g. the events and the
+    telemetry of a device) and filter changes with deadbands, given here as
+    {short topic name: {field: deadband}}.
     """
-    def __init__(self, device, stype='Event', topic=None, tsleep=0.1, device_id=None):
+    def __init__(self, device, stype='Event', topic=None, tsleep=0.1, device_id=None,
+                 multiplex=True, poller=None, nkeep=100, columnar=False, cache=None, deadbands=None):
 
         self.device = device
         self.device_id = device_id
         self.type = stype
 
         self.tsleep = tsleep
+        self.nkeep = nkeep
+        self.columnar = columnar
 
         self.subscribers = {}
+        self.cache = cache if cache is not None else LatestValueCache()
+        for name, fields in (deadbands or {}).items():
+            for field, deadband in fields.items():
+                self.cache.set_deadband(topic_name(self.device, name, self.type), field, deadband)
+
+        # Unless multiplex is False, all topics are read by a single DDSPoller thread.
+        # A poller can be shared by several containers (e.g. one per device).
+        self.poller = None
+        self._own_poller = multiplex and poller is None  # Stopped by close(), a shared poller is not
+        if multiplex:
+            self.poller = poller if poller is not None else DDSPoller(tsleep=self.tsleep)
 
         self.log = create_logger(name=self.device)
 
-        self.log.debug("Loading Device: {}".format(self.device))
+        self.log.debug("Loading Device: %s", self.device)
         # Load SALPY_lib into the class
-        self.SALPY_lib = import_module('SALPY_{}'.format(self.device))
-        if self.device_id is None:
-            self.mgr = getattr(self.SALPY_lib, 'SAL_{}'.format(self.device))()
-        else:
-            try:
-                self.mgr = getattr(self.SALPY_lib, 'SAL_{}'.format(self.device))(self.device_id)
-            except TypeError:
-                self.log.error('Could not initialize component {} '
-                               'with device id {}. Trying with no id.'.format(self.device, self.device_id))
-                self.device_id = None
-                self.mgr = getattr(self.SALPY_lib, 'SAL_{}'.format(self.device))()
+        self.mgr = get_manager(self.device, self.device_id)
+        self.device_id = self.mgr.device_id
+        self.SALPY_lib = self.mgr.SALPY_lib
 
         if topic is not None:
-            self.log.debug("Loading topic: {}".format(topic))
+            self.log.debug("Loading topic: %s", topic)
             self.topic = [topic]
         else:
             # Inspect device type to get all topics
             self.topic = []
-            self.log.debug("Loading all topics from {}".format(self.device))
-
-            # inspect and get valid commands:
-            members = inspect.getmembers(self.SALPY_lib)
-
-            def checker(_name, _type, _device):
-                if _type == 'Event' and '_logevent_' in _name:
-                    return True
-                elif ((_type == 'Telemetry') and (_device + '_' in _name) and
-                      ('_logevent_' not in _name) and ('command' not in _name)):
-                    return True
+            self.log.debug("Loading all topics from %s", self.device)
+
+            for name in get_catalog(self.device, self.SALPY_lib).topics(self.type):
+                self.log.debug('Adding %s...', name)
+                self.topic.append(name)
+                try:
+                    self.subscribers[name] = DDSSubscriber(Device=self.device,
+                                                           topic=name,
+                                                           Stype=self.type,
+                                                           threadID='{}_{}_{}'.format(self.device,
+                                                                                      self.type, name),
+                                                           tsleep=self.tsleep,
+                                                           device_id=self.device_id,
+                                                           nkeep=self.nkeep,
+                                                           columnar=self.columnar)
+                except AttributeError:
+                    self.log.debug('Could not add %s... Skipping...', name)
                 else:
-                    return False
+                    self.subscribers[name].add_callback(functools.partial(self.cache.update,
+                                                                          self.subscribers[name].topic_name))
+                    if self.poller is not None:
+                        self.poller.add_subscriber(self.subscribers[name])
+                    else:
+                        self.subscribers[name].start()
 
-            break_string = '_logevent_' if self.topic == 'Event' else '_'
+        if self.poller is not None and not self.poller.is_alive():
+            self.poller.start()
+
+    def close(self):
+        """Stop the poller created by the container (if any) and give the SAL managers back to the pool."""
+        if self._own_poller and self.poller.is_alive():
+            self.poller.stop()
+            self.poller.join()
+        for subscriber in self.subscribers.values():
+            if self.poller is not None:
+                self.poller.remove_subscriber(subscriber)
+            subscriber.close()
+        release_manager(self.mgr)
+
+    def stats(self):
+        """Return {topic: DDSSubscriber.stats()} for all the topics, and {'cache': the cache statistics}."""
+        stats = {name: subscriber.stats() for name, subscriber in self.subscribers.items()}
+        stats['cache'] = self.cache.stats()
+        return stats
+
+    def to_arrays(self, last=None):
+        """Return {topic: {field: array}} with the last samples of every topic.
+
+        Requires columnar=True, see DDSSubscriber.to_arrays.
+        """
+        return {name: subscriber.to_arrays(last) for name, subscriber in self.subscribers.items()}
 
-            for member in members:
-                if checker(member[0], self.type, self.device):
-                    name = member[0].split(break_string)[-1][:-1]
-                    self.log.debug('Adding {}...'.format(name))
-                    self.topic.append(name)
-                    try:
-                        self.subscribers[name] = DDSSubscriber(Device=self.device,
-                                                               topic=name,
-                                                               Stype=self.type,
-                                                               threadID='{}_{}_{}'.format(self.device,
-                                                                                          self.type, name),
-                                                               tsleep=self.tsleep,
-                                                               device_id=device_id)
-                        self.subscribers[name].start()
-                    except AttributeError:
-                        self.log.debug('Could not add {}... Skipping...'.format(name))
-                    else:
-                        setattr(self, name, self.subscribers[name].myData)
+    def changed_since(self, version):
+        """Return the current version and {full topic name: {field: value}} changed after version.
+
+        See LatestValueCache.changed_since.
+        """
+        return self.cache.changed_since(version)
 
     def __getattr__(self, item):
         if item in self.topic:
@@ -1054,33 +2078,239 @@ class DDSSubscriberContainer:
             raise AttributeError('No attribute ' + item)
 
 
-def command_sequencer(commands, Device='atHeaderService', wait_time=1, sleep_time=3):
+class CommandStep:
+    """A command of a CommandSequencer.
+
+    The step is issued once every step in after has reached the start_on stage:
+    'ack' (SAL__CMD_ACK received), 'inprogress' (SAL__CMD_INPROGRESS received)
+    or 'complete' (final ack received). Starting on 'ack' or 'inprogress'
+    pipelines the step with the ones it depends on.
+
+    Attributes:
+        name: Name of the step, unique in a sequence (default: device.cmd).
+        device: Device receiving the command.
+        cmd: Name of the command.
+        params: Parameters of the command.
+        after: Names of the steps this one depends on.
+        start_on: Stage the steps in after must reach.
+        timeout: Seconds to wait for the final ack (None: the sequencer timeout).
+        delay: Seconds to wait before issuing the command.
+        status: 'waiting', 'issued', 'complete', 'failed', 'timeout' or 'skipped'.
+        cmdid: Command id (None if not issued).
+        acks: The (ack, error, result) received.
+        start: Time the command was issued, from the start of the sequence.
+        latency: {stage: seconds from the issue of the command to the stage}.
+    """
+    STAGES = ('ack', 'inprogress', 'complete')
+
+    def __init__(self, device, cmd, params=None, after=(), start_on='complete', name=None, timeout=None,
+                 delay=0.):
+        if start_on not in self.STAGES:
+            raise ValueError('start_on must be one of {}, got {}'.format(self.STAGES, start_on))
+        self.name = name if name is not None else '{}.{}'.format(device, cmd)
+        self.device = device
+        self.cmd = cmd
+        self.params = dict(params) if params is not None else {}
+        self.after = (after, ) if isinstance(after, str) else tuple(after)
+        self.start_on = start_on
+        self.timeout = timeout
+        self.delay = delay
+        self.status = 'waiting'
+        self.cmdid = None
+        self.acks = []
+        self.start = None
+        self.latency = {}
+
+    def report(self):
+        return {'name': self.name,
+                'status': self.status,
+                'cmdid': self.cmdid,
+                'ack': self.acks[-1] if len(self.acks) > 0 else None,
+                'start': self.start,
+                'latency': dict(self.latency)}
+
+
+class CommandSequencer:
+    """Send a set of commands, to one or several Devices, following their dependencies.
+
+    Steps that do not depend on each other are issued concurrently, a step is
+    issued as soon as its dependencies reached its start_on stage (see
+    CommandStep), and if a step fails or times out the steps depending on it
+    are skipped (unless continue_on_error is True).
+
+    Attributes:
+        steps: The CommandStep, by name, in the order they were given.
+        timeout: Default seconds to wait for the final ack of each step.
+        continue_on_error: Issue the steps depending on a failed one anyway.
+        senders: DDSSend used for each Device.
+    """
+    def __init__(self, steps, timeout=30, continue_on_error=False, senders=None):
+        self.steps = collections.OrderedDict()
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError('Duplicated step name: {}'.format(step.name))
+            self.steps[step.name] = step
+        self.timeout = timeout
+        self.continue_on_error = continue_on_error
+        self.senders = dict(senders) if senders is not None else {}
+        self._own_senders = []
+        self.log = LOGGER
+        self._check_dependencies()
+
+    @classmethod
+    def from_list(cls, device, commands, start_on='complete', **kwargs):
+        """Sequence where each command of a Device depends on the previous one.
+
+        Parameters
+        ----------
+        device: str
+        commands: list
+            Names of the commands, or (name, params) pairs.
+        start_on: str
+            Stage of the previous command that starts the next one.
+        """
+        steps = []
+        for i, command in enumerate(commands):
+            cmd, params = (command, None) if isinstance(command, str) else command
+            steps.append(CommandStep(device, cmd, params, name='{}:{}'.format(i, cmd),
+                                     after=steps[-1].name if len(steps) > 0 else (), start_on=start_on))
+        return cls(steps, **kwargs)
+
+    def _check_dependencies(self):
+        """Raise ValueError for an unknown dependency or a cycle."""
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError('Dependency cycle: {}'.format(' -> '.join(path + [name])))
+            state[name] = 'visiting'
+            for dependency in self.steps[name].after:
+                if dependency not in self.steps:
+                    raise ValueError('Step {} depends on unknown step {}'.format(name, dependency))
+                visit(dependency, path + [name])
+            state[name] = 'done'
+
+        for name in self.steps:
+            visit(name, [])
+
+    def get_sender(self, device):
+        if device not in self.senders:
+            sender = DDSSend(device, sleeptime=0.001, max_sleeptime=0.1)
+            sender.start()
+            self.senders[device] = sender
+            self._own_senders.append(sender)
+        return self.senders[device]
+
+    def close(self):
+        """Stop the DDSSend created by the sequencer."""
+        for sender in self._own_senders:
+            sender.close()
+        for sender in self._own_senders:
+            self.senders.pop(sender.Device, None)
+        self._own_senders = []
+
+    def run(self):
+        """Run the sequence, blocking until all the steps are done.
+
+        Returns
+        -------
+        list
+            The report() of each step.
+        """
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        """Run the sequence from an event loop, see run()."""
+        self._t0 = time.monotonic()
+        self._stages = {name: {stage: asyncio.Event() for stage in CommandStep.STAGES} for name in self.steps}
+        for step in self.steps.values():
+            step.status = 'waiting'
+            step.cmdid = None
+            step.acks = []
+            step.start = None
+            step.latency = {}
+        await asyncio.gather(*[self._run_step(step) for step in self.steps.values()])
+        report = [step.report() for step in self.steps.values()]
+        for step in report:
+            self.log.info('Step %s: %s in %s (issued at %s)', step['name'], step['status'],
+                          step['latency'].get('complete'), step['start'])
+        return report
+
+    def _reached(self, step, stage):
+        if stage not in step.latency:
+            step.latency[stage] = time.monotonic() - self._t0 - step.start
+        # Reaching a stage implies the previous ones, even if their acks were not seen
+        for _stage in CommandStep.STAGES[:CommandStep.STAGES.index(stage) + 1]:
+            self._stages[step.name][_stage].set()
+
+    def _finish(self, step, status):
+        step.status = status
+        # Wake up the steps depending on this one
+        for event in self._stages[step.name].values():
+            event.set()
+
+    async def _run_step(self, step):
+        for dependency in step.after:
+            await self._stages[dependency][step.start_on].wait()
+        failed = [dependency for dependency in step.after
+                  if self.steps[dependency].status in ('failed', 'timeout', 'skipped')]
+        if len(failed) > 0 and not self.continue_on_error:
+            self.log.warning('Skipping step %s, %s did not complete', step.name, ', '.join(failed))
+            self._finish(step, 'skipped')
+            return
+        if step.delay > 0:
+            await asyncio.sleep(step.delay)
+
+        step.start = time.monotonic() - self._t0
+        self.log.info('Issuing command: %s', step.name)
+        try:
+            sender = self.get_sender(step.device)
+            # send_Command blocks (on the SAL call and the lock of the sender), keep it out of the loop
+            step.cmdid, _ = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(sender.send_Command, step.cmd, **step.params))
+        except Exception:
+            self.log.exception('Could not issue step %s', step.name)
+            self._finish(step, 'failed')
+            return
+        step.status = 'issued'
+        timeout = step.timeout if step.timeout is not None else self.timeout
+        try:
+            await asyncio.wait_for(self._read_acks(sender, step), timeout)
+        except asyncio.TimeoutError:
+            self.log.warning('Step %s timed out after %s sec', step.name, timeout)
+            self._finish(step, 'timeout')
+
+    async def _read_acks(self, sender, step):
+        async for ack in sender.ack_stream(step.cmdid):
+            step.acks.append(ack)
+            if CommandResponse.is_final(ack):
+                self._reached(step, 'complete')
+                self._finish(step, 'complete' if ack[0] == SAL__CMD_COMPLETE else 'failed')
+            elif ack[0] == SAL__CMD_INPROGRESS:
+                self._reached(step, 'inprogress')
+            else:
+                self._reached(step, 'ack')
+
+
+def command_sequencer(commands, Device='atHeaderService', wait_time=1, sleep_time=0):
     """
     Stand-alone function to send a sequence of OCS Commands
+
+    Each command is issued once the previous one completed (or timed out
+    after wait_time seconds), sleep_time seconds later. Use CommandSequencer
+    to send independent commands concurrently.
     """
-    # We get the equivalent of:
-    #  mgr = SALPY_atHeaderService.SAL_atHeaderService()
-    # Load (if not in globals already) SALPY_{deviceName}
-    SALPY_lib = load_SALPYlib(Device)
-
-    mgr = getattr(SALPY_lib, 'SAL_{}'.format(Device))()
-    myData = {}
-    issueCommand = {}
-    waitForCompletion = {}
+    steps = []
     for cmd in commands:
-        myData[cmd] = getattr(SALPY_lib, '{}_command_{}C'.format(Device, cmd))()
-        issueCommand[cmd] = getattr(mgr, 'issueCommand_{}'.format(cmd))
-        waitForCompletion[cmd] = getattr(mgr, 'waitForCompletion_{}'.format(cmd))
         # If Start we send some non-sense value
-        if cmd == 'Start':
-            myData[cmd].configure = 'blah.json'
-
-    for cmd in commands:
-        LOGGER.info("Issuing command: {}".format(cmd))
-        LOGGER.info("Wait for Completion: {}".format(cmd))
-        cmdId = issueCommand[cmd](myData[cmd])
-        waitForCompletion[cmd](cmdId, wait_time)
-        LOGGER.info("Done: {}".format(cmd))
-        time.sleep(sleep_time)
-
-    return
+        params = {'configure': 'blah.json'} if cmd == 'Start' else None
+        steps.append(CommandStep(Device, cmd, params, name='{}:{}'.format(len(steps), cmd), timeout=wait_time,
+                                 after=steps[-1].name if len(steps) > 0 else (),
+                                 delay=sleep_time if len(steps) > 0 else 0.))
+    sequencer = CommandSequencer(steps, continue_on_error=True)
+    try:
+        return sequencer.run()
+    finally:
+        sequencer.close()
@@ -0,0 +1,258 @@
+import os
+import json
+import threading
+from .topic_schema import get_schema
+from .utils import create_logger, load_SALPYlib, topic_name
+
+"""
+Catalog of the topics of a SALPY_<device> library.
+
+Finding the topics of a device means scanning the members of its SALPY module
+and matching their names, and their field layouts require creating a struct of
+each topic. A TopicCatalog does it once per device and process. It can also
+keep the result on disk (see get_catalog), invalidated when the SALPY module
+file changes, so that a process subscribing to many devices does not pay for
+it at every start.
+"""
+
+__all__ = ['TopicInfo', 'TopicCatalog', 'get_catalog']
+
+LOGGER = create_logger(name=__name__)
+
+STYPES = ('Telemetry', 'Event', 'Command')
+
+# Environment variable with the default directory of the on-disk cache
+CACHE_DIR_ENV = 'SALPYTOOLS_CATALOG_DIR'
+
+
+class TopicInfo:
+    """A topic of a device.
+
+    Attributes:
+        device: Name of the SALPY component.
+        topic: Short name of the topic (e.g. target).
+        stype: Telemetry, Event or Command.
+        name: Full name of the topic (e.g. scheduler_logevent_target).
+    """
+    __slots__ = ('device', 'topic', 'stype', 'name', '_SALPY_lib', '_data_class', '_layout')
+
+    def __init__(self, SALPY_lib, device, topic, stype, layout=None):
+        self.device = device
+        self.topic = topic
+        self.stype = stype
+        self.name = topic_name(device, topic, stype)
+        self._SALPY_lib = SALPY_lib
+        self._data_class = None
+        self._layout = layout
+
+    def __repr__(self):
+        return 'TopicInfo({})'.format(self.name)
+
+    @property
+    def data_class(self):
+        """SALPY class of the samples (e.g. SALPY_scheduler.scheduler_logevent_targetC)."""
+        if self._data_class is None:
+            self._data_class = getattr(self._SALPY_lib, '{}C'.format(self.name))
+        return self._data_class
+
+    def new_data(self):
+        return self.data_class()
+
+    @property
+    def schema(self):
+        return get_schema(self.new_data())
+
+    @property
+    def layout(self):
+        """Tuple of (field, type name, length or None) of the topic."""
+        if self._layout is None:
+            schema = self.schema
+            self._layout = tuple((field, ftype.__name__, length)
+                                 for field, ftype, length in zip(schema.fields, schema.types, schema.lengths))
+        return self._layout
+
+
+class TopicCatalog:
+    """The Telemetry, Event and Command topics of a SALPY library.
+
+    The members of the module are only enumerated the first time the topics
+    are needed, and the field layouts of a topic the first time they are asked
+    for.
+
+    Attributes:
+        device: Name of the SALPY component.
+        SALPY_lib: The SALPY_<device> module.
+        cache_file: File of the on-disk cache, None if not used.
+    """
+    def __init__(self, device, SALPY_lib=None, cache_dir=None):
+        self.device = device
+        self.SALPY_lib = SALPY_lib if SALPY_lib is not None else load_SALPYlib(device)
+        self.cache_file = None
+        module_file = getattr(self.SALPY_lib, '__file__', None)
+        if cache_dir is not None and module_file is not None:
+            self.cache_file = os.path.join(cache_dir, 'SALPY_{}.json'.format(device))
+        self._topics = None  # {stype: {topic: TopicInfo}}
+        self._by_name = None  # {name: TopicInfo}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TopicCatalog({})'.format(self.device)
+
+    def _load(self):
+        with self._lock:
+            if self._topics is not None:
+                return
+            layouts = self._read_cache()
+            if layouts is None:
+                topics = self._enumerate()
+            else:
+                topics = {stype: {} for stype in STYPES}
+                for stype in STYPES:
+                    for topic, layout in layouts[stype].items():
+                        layout = tuple(tuple(field) for field in layout)
+                        topics[stype][topic] = TopicInfo(self.SALPY_lib, self.device, topic, stype, layout)
+            self._by_name = {info.name: info for stype in STYPES for info in topics[stype].values()}
+            self._topics = topics
+        if layouts is None and self.cache_file is not None:
+            self.save()
+
+    def _enumerate(self):
+        """Find the topics from the names of the members of the module."""
+        prefix = self.device + '_'
+        topics = {stype: {} for stype in STYPES}
+        for member in dir(self.SALPY_lib):
+            if not member.startswith(prefix) or not member.endswith('C'):
+                continue
+            name = member[len(prefix):-1]
+            if name.startswith('logevent_'):
+                stype, topic = 'Event', name[len('logevent_'):]
+            elif name.startswith('command_'):
+                stype, topic = 'Command', name[len('command_'):]
+            elif name == 'ackcmd':
+                continue
+            else:
+                stype, topic = 'Telemetry', name
+            topics[stype][topic] = TopicInfo(self.SALPY_lib, self.device, topic, stype)
+        LOGGER.debug('Found %i telemetry, %i events and %i commands in SALPY_%s', len(topics['Telemetry']),
+                     len(topics['Event']), len(topics['Command']), self.device)
+        return topics
+
+    def _module_mtime(self):
+        return os.path.getmtime(self.SALPY_lib.__file__)
+
+    def _read_cache(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file) as cache:
+                content = json.load(cache)
+            if content['file'] != self.SALPY_lib.__file__ or content['mtime'] != self._module_mtime():
+                return None
+            return content['topics']
+        except (OSError, ValueError, KeyError):
+            LOGGER.warning('Ignoring invalid catalog cache %s', self.cache_file)
+            return None
+
+    def save(self):
+        """Write the catalog, with the layouts of all the topics, to the on-disk cache."""
+        if self.cache_file is None:
+            return
+        content = {'file': self.SALPY_lib.__file__,
+                   'mtime': self._module_mtime(),
+                   'topics': {stype: {topic: info.layout for topic, info in self.topics_info(stype).items()}
+                              for stype in STYPES}}
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+            with open(tmp_file, 'w') as cache:
+                json.dump(content, cache)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as error:
+            LOGGER.warning('Could not write catalog cache %s: %s', self.cache_file, error)
+
+    def topics_info(self, stype):
+        """Return {topic: TopicInfo} for Telemetry, Event or Command."""
+        if self._topics is None:
+            self._load()
+        return self._topics[stype]
+
+    def topics(self, stype):
+        """Return the names of the topics of a type (Telemetry, Event or Command)."""
+        return tuple(self.topics_info(stype))
+
+    @property
+    def telemetry(self):
+        return self.topics('Telemetry')
+
+    @property
+    def events(self):
+        return self.topics('Event')
+
+    @property
+    def commands(self):
+        return self.topics('Command')
+
+    @property
+    def ack_class(self):
+        """SALPY class of the command acks."""
+        return getattr(self.SALPY_lib, '{}_ackcmdC'.format(self.device))
+
+    def get(self, topic, stype='Telemetry'):
+        """Return the TopicInfo of a topic.
+
+        Raises
+        ------
+        AttributeError
+            If the device has no such topic.
+        """
+        info = self.topics_info(stype).get(topic)
+        if info is None:
+            raise AttributeError('SALPY_{} has no {} {}'.format(self.device, stype, topic))
+        return info
+
+    def by_name(self, name):
+        """Return the TopicInfo of a topic from its full name (e.g. scheduler_logevent_target)."""
+        if self._by_name is None:
+            self._load()
+        info = self._by_name.get(name)
+        if info is None:
+            raise AttributeError('SALPY_{} has no topic {}'.format(self.device, name))
+        return info
+
+    def data_class(self, topic, stype='Telemetry'):
+        return self.get(topic, stype).data_class
+
+    def new_data(self, topic, stype='Telemetry'):
+        return self.get(topic, stype).data_class()
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(device, SALPY_lib=None, cache_dir=None):
+    """Return the (cached) TopicCatalog of a device.
+
+    Parameters
+    ----------
+    device: str
+        Name of the SALPY component (e.g. scheduler).
+    SALPY_lib: module, opt
+        The SALPY_<device> module, imported if not given.
+    cache_dir: str, opt
+        Directory of the on-disk cache. Default: the SALPYTOOLS_CATALOG_DIR
+        environment variable, no on-disk cache if it is not set.
+
+    Returns
+    -------
+    TopicCatalog
+    """
+    catalog = _catalogs.get(device)
+    if catalog is None or (SALPY_lib is not None and catalog.SALPY_lib is not SALPY_lib):
+        with _catalogs_lock:
+            catalog = _catalogs.get(device)
+            # A different module (e.g. reloaded) needs a new catalog
+            if catalog is None or (SALPY_lib is not None and catalog.SALPY_lib is not SALPY_lib):
+                cache_dir = cache_dir if cache_dir is not None else os.environ.get(CACHE_DIR_ENV)
+                catalog = _catalogs[device] = TopicCatalog(device, SALPY_lib, cache_dir=cache_dir)
+    return catalog
@@ -0,0 +1,106 @@
+import operator
+import threading
+
+"""
+Per-topic description of the fields of SALPY data structures.
+
+The SALPY structs are reused by the readers (getNextSample_*, getEvent_*, ...
+overwrite them in place), so whatever we keep must be a copy. TopicSchema
+resolves the list of fields of a topic once and builds compact immutable
+TopicSample records from a struct.
+"""
+
+__all__ = ['TopicSample', 'TopicSchema', 'get_schema']
+
+
+class TopicSample(tuple):
+    """Immutable copy of a SALPY struct.
+
+    Fields are accessed as attributes, like on the struct (sample.ra).
+    Array fields are stored as tuples.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__,
+                               ', '.join('{}={!r}'.format(field, value)
+                                         for field, value in zip(self._fields, self)))
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+
+class TopicSchema:
+    """Field layout of a topic, resolved once from a SALPY struct.
+
+    Attributes:
+        name: Name of the struct class (e.g. scheduler_logevent_targetC).
+        fields: Tuple with the names of the fields.
+        types: Tuple with the type of each field (the element type for arrays).
+        lengths: Tuple with the length of each array field (None for scalars).
+        array_fields: Tuple with the index (in fields) of the array fields.
+        sample_class: TopicSample subclass used by snapshot().
+    """
+    def __init__(self, data):
+        self.name = type(data).__name__
+        self.fields = tuple(attr for attr in dir(data)
+                            if not attr.startswith('__') and not callable(getattr(data, attr)))
+        values = [getattr(data, field) for field in self.fields]
+        self.lengths = tuple(len(value) if _is_array(value) else None for value in values)
+        self.types = tuple(type(value) if length is None else
+                           (type(value[0]) if length > 0 else float)
+                           for value, length in zip(values, self.lengths))
+        self.array_fields = tuple(i for i, length in enumerate(self.lengths) if length is not None)
+
+        # Get all the fields with a single call
+        getter = operator.attrgetter(*self.fields) if len(self.fields) > 0 else (lambda data: ())
+        self._getter = getter if len(self.fields) != 1 else (lambda data: (getter(data),))
+
+        attributes = {field: property(operator.itemgetter(i)) for i, field in enumerate(self.fields)}
+        attributes.update({'__slots__': (), '_fields': self.fields})
+        class_name = self.name[:-1] if self.name.endswith('C') else self.name
+        self.sample_class = type(class_name + 'Sample', (TopicSample, ), attributes)
+
+    def __repr__(self):
+        return 'TopicSchema({}, {} fields)'.format(self.name, len(self.fields))
+
+    def snapshot(self, data):
+        """Copy the values of a SALPY struct into a TopicSample."""
+        values = self._getter(data)
+        if self.array_fields:
+            values = list(values)
+            for i in self.array_fields:
+                values[i] = tuple(values[i])
+        return tuple.__new__(self.sample_class, values)
+
+    def as_dict(self, data):
+        """Return a dictionary {field: value} with the values of a SALPY struct."""
+        return dict(zip(self.fields, self._getter(data)))
+
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def get_schema(data):
+    """Return the (cached) TopicSchema for a SALPY struct.
+
+    Parameters
+    ----------
+    data: SALPY struct instance (e.g. SALPY_scheduler.scheduler_logevent_targetC())
+
+    Returns
+    -------
+    TopicSchema
+    """
+    data_class = type(data)
+    schema = _schemas.get(data_class)
+    if schema is None:
+        with _schemas_lock:
+            schema = _schemas.setdefault(data_class, TopicSchema(data))
+    return schema
+
+
+def _is_array(value):
+    return hasattr(value, '__len__') and not isinstance(value, (str, bytes))
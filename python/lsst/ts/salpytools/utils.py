@@ -1,7 +1,7 @@
 from importlib import import_module
 import logging
 
-__all__ = ['create_logger', 'load_SALPYlib']
+__all__ = ['create_logger', 'load_SALPYlib', 'topic_name']
 
 
 log = logging.getLogger(__name__)
@@ -37,3 +37,27 @@ def load_SALPYlib(device):
     """
     SALPY_lib = import_module('SALPY_{}'.format(device))
     return SALPY_lib
+
+
+def topic_name(device, topic, stype='Telemetry'):
+    """Build the full name of a SAL topic.
+
+    Parameters
+    ----------
+    device: str
+        Name of the SALPY component (e.g. scheduler).
+    topic: str
+        Short name of the topic (e.g. bulkCloud, target, enable).
+    stype: str, opt
+        One of Telemetry, Event or Command. Default Telemetry.
+
+    Returns
+    -------
+    str
+        e.g. scheduler_bulkCloud, scheduler_logevent_target or scheduler_command_enable
+    """
+    if stype == 'Event':
+        return '{}_logevent_{}'.format(device, topic)
+    elif stype == 'Command':
+        return '{}_command_{}'.format(device, topic)
+    return '{}_{}'.format(device, topic)
@@ -0,0 +1,45 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.backoff import AdaptiveInterval
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(1., 0.5)
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(0.1, 1., factor=0.5)
+
+    def test_fixed_interval(self):
+        interval = AdaptiveInterval(0.1)
+        self.assertEqual(interval.update(0), 0.1)
+        self.assertEqual(interval.update(1), 0.1)
+
+    def test_backoff(self):
+        interval = AdaptiveInterval(0.1, 0.5, factor=2.)
+
+        self.assertAlmostEqual(interval.update(0), 0.2)
+        self.assertAlmostEqual(interval.update(0), 0.4)
+        self.assertAlmostEqual(interval.update(0), 0.5)
+        self.assertAlmostEqual(interval.update(0), 0.5)
+        # Data: back to the shortest interval
+        self.assertAlmostEqual(interval.update(3), 0.1)
+
+        stats = interval.stats()
+        self.assertEqual(stats['npolls'], 5)
+        self.assertEqual(stats['nempty'], 4)
+        self.assertEqual(stats['nsamples'], 3)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_percentiles(self):
+        result = benchmark.percentiles(list(range(100)))
+
+        self.assertEqual((result['p50'], result['p90'], result['p99']), (50, 90, 99))
+        self.assertEqual(result['count'], 100)
+        self.assertIsNone(benchmark.percentiles([])['p50'])
+
+    def test_telemetry_throughput_lost(self):
+        result = benchmark.bench_telemetry_throughput(2, 50, timeout=0.1, loss=0.5)
+
+        self.assertGreater(result['lost'], 0)
+        self.assertEqual(result['samples'], 100)
+
+    def test_command_latency(self):
+        result = benchmark.bench_command_latency(5)
+
+        self.assertEqual(result['count'], 5)
+        self.assertEqual(result['failed'], 0)
+
+    def test_compare(self):
+        old = {'results': {'a': [{'rate': 100.}], 'b': {'p50': 2.}, 'c': 'text'}}
+        new = {'results': {'a': [{'rate': 150.}], 'b': {'p50': 1.}}}
+
+        self.assertEqual(benchmark.compare_results(old, new), {'a.0.rate': (100., 150., 0.5),
+                                                               'b.p50': (2., 1., -0.5)})
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
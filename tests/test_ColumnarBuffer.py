@@ -0,0 +1,68 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.topic_schema import get_schema
+from lsst.ts.salpytools.columnar import ColumnarBuffer, np
+
+
+class dome_positionC:
+    """Stand-in for a SALPY struct."""
+    def __init__(self):
+        self.azimuth = 0.
+        self.encoders = [0, 0]
+        self.note = ''
+
+
+@unittest.skipIf(np is None, "numpy is not available")
+class TestColumnarBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = get_schema(dome_positionC())
+        self.buffer = ColumnarBuffer(self.schema, capacity=3)
+
+    def append(self, i):
+        data = dome_positionC()
+        data.azimuth = float(i)
+        data.encoders = [i, 2 * i]
+        self.buffer.append(self.schema.snapshot(data), rcv_time=float(i))
+
+    def test_fields(self):
+        # Strings are not stored
+        self.assertEqual(self.buffer.fields, ('azimuth', 'encoders', 'rcv_time'))
+        self.assertEqual(len(self.buffer.to_arrays()['azimuth']), 0)
+
+    def test_to_arrays(self):
+        for i in range(5):
+            self.append(i)
+
+        arrays = self.buffer.to_arrays()
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(arrays['azimuth'].tolist(), [2., 3., 4.])
+        self.assertEqual(arrays['encoders'].tolist(), [[2, 4], [3, 6], [4, 8]])
+        self.assertEqual(self.buffer.to_arrays(last=1)['azimuth'].tolist(), [4.])
+        # Copies, not modified by the next appends
+        self.append(5)
+        self.assertEqual(arrays['azimuth'].tolist(), [2., 3., 4.])
+        self.assertEqual(arrays['rcv_time'].tolist(), [2., 3., 4.])
+
+    def test_window(self):
+        for i in range(5):
+            self.append(i)
+
+        self.assertEqual(self.buffer.window(3., 10.)['azimuth'].tolist(), [3., 4.])
+        self.assertEqual(self.buffer.window(0., 2.)['azimuth'].tolist(), [])
+        window = self.buffer.window(3., 4.)
+        self.append(5)
+        self.assertEqual(window['encoders'].tolist(), [[3, 6]])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
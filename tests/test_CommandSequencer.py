@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.salpylib import CommandStep, CommandSequencer
+
+
+class TestCommandSequencer(unittest.TestCase):
+
+    def test_from_list(self):
+        commands = ['enterControl', ('start', {'configure': 'a'}), 'enable']
+        sequencer = CommandSequencer.from_list('atHeaderService', commands, start_on='ack')
+        steps = list(sequencer.steps.values())
+
+        self.assertEqual([step.cmd for step in steps], ['enterControl', 'start', 'enable'])
+        self.assertEqual(steps[0].after, ())
+        self.assertEqual(steps[1].after, (steps[0].name, ))
+        self.assertEqual(steps[2].after, (steps[1].name, ))
+        self.assertEqual(steps[1].params, {'configure': 'a'})
+        self.assertEqual(steps[2].start_on, 'ack')
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            CommandSequencer([CommandStep('dev', 'a', after='dev.c'),
+                              CommandStep('dev', 'b', after='dev.a'),
+                              CommandStep('dev', 'c', after='dev.b')])
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            CommandSequencer([CommandStep('dev', 'a', after='dev.b')])
+
+    def test_duplicated_name(self):
+        with self.assertRaises(ValueError):
+            CommandSequencer([CommandStep('dev', 'a'), CommandStep('dev', 'a')])
+
+    def test_reached_records_observed_stages(self):
+        sequencer = CommandSequencer([CommandStep('dev', 'a')])
+        step = sequencer.steps['dev.a']
+
+        async def complete_only():
+            sequencer._t0 = 0.
+            sequencer._stages = {step.name: {stage: asyncio.Event() for stage in CommandStep.STAGES}}
+            step.start = 0.
+            sequencer._reached(step, 'complete')
+            return [event.is_set() for event in sequencer._stages[step.name].values()]
+
+        # The earlier stages are released but have no latency, their acks were not seen
+        self.assertEqual(asyncio.run(complete_only()), [True, True, True])
+        self.assertEqual(list(step.latency), ['complete'])
+
+    def test_start_on(self):
+        with self.assertRaises(ValueError):
+            CommandStep('dev', 'a', start_on='sent')
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,95 @@
+import time
+import importlib
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.fake_salpy import FakeSALBus, install_fake_salpy, uninstall_fake_salpy
+
+SCHEMA = {'telemetry': {'mountStatus': {'az': float, 'position': (float, 3)}},
+          'events': {'target': {'targetId': int}},
+          'commands': {'enable': {'value': bool}}}
+
+
+class TestFakeSALPY(unittest.TestCase):
+
+    def setUp(self):
+        self.SALPY_lib = install_fake_salpy('fakesal', SCHEMA)
+
+    def tearDown(self):
+        uninstall_fake_salpy('fakesal')
+
+    def test_module(self):
+        self.assertIs(importlib.import_module('SALPY_fakesal'), self.SALPY_lib)
+        data = self.SALPY_lib.fakesal_mountStatusC()
+        self.assertEqual(data.position, [0., 0., 0.])
+        self.assertEqual(data.private_seqNum, 0)
+        with self.assertRaises(TypeError):
+            self.SALPY_lib.SAL_fakesal(1)
+
+    def test_telemetry(self):
+        reader, writer = self.SALPY_lib.SAL_fakesal(), self.SALPY_lib.SAL_fakesal()
+        data = self.SALPY_lib.fakesal_mountStatusC()
+        self.assertEqual(reader.getNextSample_mountStatus(data), self.SALPY_lib.SAL__NO_UPDATES)
+
+        reader.salTelemetrySub('fakesal_mountStatus')
+        writer.salTelemetryPub('fakesal_mountStatus')
+        data.az = 1.
+        writer.putSample_mountStatus(data)
+        received = self.SALPY_lib.fakesal_mountStatusC()
+
+        self.assertEqual(reader.getNextSample_mountStatus(received), self.SALPY_lib.SAL__OK)
+        self.assertEqual(received.az, 1.)
+        self.assertEqual(received.private_seqNum, data.private_seqNum)
+
+    def test_command(self):
+        controller, sender = self.SALPY_lib.SAL_fakesal(), self.SALPY_lib.SAL_fakesal()
+        controller.salProcessor('fakesal_command_enable')
+        data = self.SALPY_lib.fakesal_command_enableC()
+        data.value = True
+        cmdid = sender.issueCommand_enable(data)
+
+        received = self.SALPY_lib.fakesal_command_enableC()
+        self.assertEqual(controller.acceptCommand_enable(received), cmdid)
+        self.assertTrue(received.value)
+        controller.ackCommand_enable(cmdid, 301, 0, 'Started')
+        controller.ackCommand_enable(cmdid, 303, 0, 'Done')
+        # The issuer is forgotten after the final ack
+        self.assertEqual(controller.processors[('fakesal_command_enable', 'issuers')], {})
+
+        ack = self.SALPY_lib.fakesal_ackcmdC()
+        self.assertEqual(sender.getResponse_enable(ack), cmdid)
+        self.assertEqual((ack.ack, ack.result), (301, 'Started'))
+        self.assertEqual(sender.getResponse_enable(ack), cmdid)
+        self.assertEqual((ack.ack, ack.result), (303, 'Done'))
+        self.assertEqual(sender.getResponse_enable(ack), self.SALPY_lib.SAL__CMD_NOACK)
+
+    def test_latency_and_loss(self):
+        SALPY_lib = install_fake_salpy('fakesal', SCHEMA, bus=FakeSALBus(latency=0.05))
+        reader, writer = SALPY_lib.SAL_fakesal(), SALPY_lib.SAL_fakesal()
+        reader.salEvent('fakesal_logevent_target')
+        data = SALPY_lib.fakesal_logevent_targetC()
+        writer.logEvent_target(data, 1)
+
+        self.assertEqual(reader.getEvent_target(data), SALPY_lib.SAL__NO_UPDATES)
+        time.sleep(0.06)
+        self.assertEqual(reader.getEvent_target(data), SALPY_lib.SAL__OK)
+
+        SALPY_lib = install_fake_salpy('fakesal', SCHEMA, bus=FakeSALBus(loss=1.))
+        reader, writer = SALPY_lib.SAL_fakesal(), SALPY_lib.SAL_fakesal()
+        reader.salEvent('fakesal_logevent_target')
+        writer.logEvent_target(data, 1)
+
+        self.assertEqual(reader.getEvent_target(data), SALPY_lib.SAL__NO_UPDATES)
+        self.assertEqual(SALPY_lib.bus.dropped, 1)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
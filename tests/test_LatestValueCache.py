@@ -0,0 +1,66 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.topic_schema import get_schema
+from lsst.ts.salpytools.latest_values import LatestValueCache
+
+
+class MountC:
+    def __init__(self):
+        self.az = 0.
+        self.mode = 'idle'
+        self.position = [0., 0.]
+        self.private_sndStamp = 0.
+
+
+def sample(**values):
+    data = MountC()
+    for field, value in values.items():
+        setattr(data, field, value)
+    return get_schema(data).snapshot(data)
+
+
+class TestLatestValueCache(unittest.TestCase):
+
+    def test_changed_since(self):
+        cache = LatestValueCache()
+        self.assertEqual(cache.update('mount', sample(az=1.)), ['az', 'mode', 'position'])
+        version, changes = cache.changed_since(0)
+        self.assertEqual(version, 1)
+        self.assertEqual(changes['mount'], {'az': 1., 'mode': 'idle', 'position': (0., 0.)})
+
+        self.assertEqual(cache.update('mount', sample(az=1., private_sndStamp=5.)), [])
+        cache.update('mount', sample(az=1., mode='tracking'))
+        cache.update('dome', sample())
+        version, changes = cache.changed_since(version)
+        self.assertEqual(version, 3)
+        self.assertEqual(changes, {'mount': {'mode': 'tracking'},
+                                   'dome': {'az': 0., 'mode': 'idle', 'position': (0., 0.)}})
+        self.assertEqual(cache.changed_since(version), (3, {}))
+        self.assertEqual(cache.get('mount').version, 2)
+
+    def test_deadband(self):
+        cache = LatestValueCache(deadbands={'mount': {'az': 0.5, 'position': 0.1}})
+        cache.update('mount', sample(az=1.))
+        self.assertEqual(cache.update('mount', sample(az=1.3, position=[0.05, 0.])), [])
+        self.assertEqual(cache.update('mount', sample(az=1.4, mode='slewing')), ['mode'])
+        # Values within the deadband keep the last value reported
+        self.assertEqual(cache.get('mount').values['az'], 1.)
+        self.assertEqual(cache.update('mount', sample(az=1.6, mode='slewing', position=[0., 0.2])),
+                         ['az', 'position'])
+        self.assertEqual(cache.stats(), {'topics': 1, 'version': 3, 'updates': 4, 'changes': 3})
+
+        with self.assertRaises(ValueError):
+            cache.set_deadband('mount', 'az', -1)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
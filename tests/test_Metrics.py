@@ -0,0 +1,132 @@
+import gc
+import json
+import unittest
+import urllib.request
+import lsst.utils.tests
+from lsst.ts.salpytools.metrics import LatencyHistogram, MetricsRegistry, start_metrics_server
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        stats = histogram.stats()
+
+        self.assertEqual(stats['count'], 0)
+        self.assertIsNone(stats['mean'])
+        self.assertIsNone(stats['p50'])
+
+    def test_add(self):
+        histogram = LatencyHistogram(buckets=(0.001, 0.01, 0.1))
+        for value in (0.0005, 0.002, 0.003, 0.05, 0.5):
+            histogram.add(value)
+
+        stats = histogram.stats()
+        self.assertEqual(stats['count'], 5)
+        self.assertAlmostEqual(stats['mean'], 0.1111)
+        self.assertEqual(stats['min'], 0.0005)
+        self.assertEqual(stats['max'], 0.5)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        # Upper edge of the bucket holding the percentile
+        self.assertEqual(stats['p50'], 0.01)
+        self.assertEqual(stats['p99'], 0.5)
+
+    def test_reset(self):
+        histogram = LatencyHistogram()
+        histogram.add(1.)
+        histogram.reset()
+        self.assertEqual(histogram.count, 0)
+
+
+class Reader:
+    """Instrumented object."""
+    def __init__(self):
+        self.histogram = LatencyHistogram(buckets=(0.1, 1.))
+        self.histogram.add(0.5)
+
+    def stats(self):
+        return {'read': 3, 'running': True, 'name': 'text', 'interval': {'npolls': 2},
+                'latency': self.histogram.stats()}
+
+
+class Broken:
+    """Instrumented object failing to return its statistics."""
+    def stats(self):
+        raise RuntimeError('No statistics')
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_collect(self):
+        registry = MetricsRegistry()
+        reader = Reader()
+        registry.register(reader, 'subscriber', topic='dev_mountStatus')
+
+        self.assertEqual(registry.collect()[0]['labels'], {'topic': 'dev_mountStatus'})
+        self.assertEqual(json.loads(registry.to_json())[0]['stats']['read'], 3)
+        registry.unregister(reader)
+        self.assertEqual(registry.collect(), [])
+
+    def test_failing_stats(self):
+        registry = MetricsRegistry()
+        broken = Broken()
+        reader = Reader()
+        registry.register(broken, 'subscriber')
+        registry.register(reader, 'subscriber')
+
+        with self.assertLogs('lsst.ts.salpytools.metrics', level='ERROR'):
+            collected = registry.collect()
+        self.assertEqual(len(collected), 1)
+        self.assertEqual(collected[0]['stats']['read'], 3)
+
+    def test_weak_references(self):
+        registry = MetricsRegistry()
+        registry.register(Reader(), 'subscriber')
+        gc.collect()
+
+        self.assertEqual(len(registry), 0)
+
+    def test_prometheus(self):
+        registry = MetricsRegistry()
+        reader = Reader()
+        registry.register(reader, 'subscriber', topic='dev_"x"')
+        lines = registry.to_prometheus().splitlines()
+
+        self.assertIn('# TYPE salpytools_subscriber_read_total counter', lines)
+        self.assertIn('salpytools_subscriber_read_total{topic="dev_\\"x\\""} 3', lines)
+        self.assertIn('# TYPE salpytools_subscriber_running gauge', lines)
+        self.assertIn('salpytools_subscriber_running{topic="dev_\\"x\\""} 1', lines)
+        self.assertIn('salpytools_subscriber_interval_npolls_total{topic="dev_\\"x\\""} 2', lines)
+        self.assertIn('# TYPE salpytools_subscriber_latency histogram', lines)
+        self.assertIn('salpytools_subscriber_latency_bucket{topic="dev_\\"x\\"",le="1.0"} 1', lines)
+        self.assertIn('salpytools_subscriber_latency_bucket{topic="dev_\\"x\\"",le="+Inf"} 1', lines)
+        self.assertIn('salpytools_subscriber_latency_count{topic="dev_\\"x\\""} 1', lines)
+        self.assertFalse(any('name' in line for line in lines))
+
+    def test_server(self):
+        registry = MetricsRegistry()
+        reader = Reader()
+        registry.register(reader, 'subscriber')
+        server = start_metrics_server(registry=registry)
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+            with urllib.request.urlopen(url + '/metrics') as response:
+                self.assertIn(b'salpytools_subscriber_read_total{} 3', response.read())
+            with urllib.request.urlopen(url + '/metrics.json') as response:
+                self.assertEqual(json.loads(response.read())[0]['stats']['read'], 3)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
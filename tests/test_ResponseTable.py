@@ -0,0 +1,72 @@
+import time
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.response_table import ResponseTable
+
+
+class TestResponseTable(unittest.TestCase):
+
+    def test_lookup(self):
+        table = ResponseTable(maxsize=10)
+        table[1] = 'a'
+
+        self.assertIn(1, table)
+        self.assertEqual(table[1], 'a')
+        self.assertIsNone(table.get(2))
+        with self.assertRaises(KeyError):
+            table[2]
+
+    def test_completed_are_evicted_first(self):
+        table = ResponseTable(maxsize=3, ttl=None)
+        for cmdid in range(3):
+            table[cmdid] = cmdid
+        table.mark_done(1)
+        table[3] = 3
+
+        self.assertEqual(len(table), 3)
+        self.assertNotIn(1, table)
+        self.assertIn(0, table)
+
+    def test_pending_evicted_when_full(self):
+        table = ResponseTable(maxsize=2, ttl=None)
+        for cmdid in range(3):
+            table[cmdid] = cmdid
+
+        self.assertNotIn(0, table)
+        self.assertEqual(table.nevicted, 1)
+
+    def test_lru(self):
+        table = ResponseTable(maxsize=3, ttl=None)
+        for cmdid in range(3):
+            table[cmdid] = cmdid
+            table.mark_done(cmdid)
+        table.get(0)
+        table[3] = 3
+
+        self.assertIn(0, table)
+        self.assertNotIn(1, table)
+
+    def test_ttl(self):
+        table = ResponseTable(maxsize=10, ttl=0.01)
+        table[1] = 1
+        table[2] = 2
+        table.mark_done(1)
+        time.sleep(0.02)
+        table.expire()
+
+        self.assertNotIn(1, table)
+        self.assertIn(2, table)
+        self.assertEqual(table.stats(), {'pending': 1, 'done': 0, 'evicted': 1})
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
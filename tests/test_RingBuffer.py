@@ -0,0 +1,68 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(ValueError):
+            RingBuffer(0)
+
+    def test_append_keeps_capacity(self):
+        buffer = RingBuffer(3)
+        for i in range(5):
+            seq = buffer.append(i)
+
+        self.assertEqual(seq, 5)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.snapshot(), [2, 3, 4])
+        self.assertEqual(buffer.latest(), 4)
+
+    def test_latest_empty(self):
+        buffer = RingBuffer(3)
+        self.assertIsNone(buffer.latest())
+        self.assertEqual(buffer.latest(default='empty'), 'empty')
+
+    def test_last(self):
+        buffer = RingBuffer(10)
+        for i in range(5):
+            buffer.append(i)
+
+        self.assertEqual(buffer.last(2), [3, 4])
+        self.assertEqual(buffer.last(20), [0, 1, 2, 3, 4])
+        self.assertEqual(buffer.last(0), [])
+
+    def test_since(self):
+        buffer = RingBuffer(4)
+        for i in range(3):
+            buffer.append(i)
+
+        seq, items = buffer.since(0)
+        self.assertEqual((seq, items), (3, [0, 1, 2]))
+
+        buffer.append(3)
+        seq, items = buffer.since(seq)
+        self.assertEqual((seq, items), (4, [3]))
+
+        seq, items = buffer.since(seq)
+        self.assertEqual((seq, items), (4, []))
+
+        # Items dropped from the buffer are not returned
+        for i in range(4, 10):
+            buffer.append(i)
+        seq, items = buffer.since(seq)
+        self.assertEqual((seq, items), (10, [6, 7, 8, 9]))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
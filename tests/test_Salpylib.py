@@ -0,0 +1,556 @@
+import time
+import asyncio
+import threading
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools import salpylib
+from lsst.ts.salpytools.columnar import np
+from lsst.ts.salpytools.manager_pool import MANAGER_POOL
+from lsst.ts.salpytools.fake_salpy import install_fake_salpy, uninstall_fake_salpy
+
+DEVICE = 'fakelib'
+
+SCHEMA = {'telemetry': {'mountStatus': {'az': float, 'el': float},
+                        'weather': {'temperature': float}},
+          'events': {'target': {'targetId': int}, 'weather': {'temperature': float}},
+          'commands': {'enable': {'value': int}, 'start': {'value': int}}}
+
+
+class Context:
+    """Execute the commands of DEVICE, failing on negative values."""
+    subsystem_tag = DEVICE
+
+    def execute_command(self, command, data):
+        if data.value < 0:
+            raise RuntimeError('Negative value')
+        return 0, '{} {}'.format(command, data.value)
+
+
+def wait_until(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < end:
+        time.sleep(0.001)
+
+
+class BlockingContext(Context):
+    """Execute the commands of DEVICE once gate is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def execute_command(self, command, data):
+        self.gate.wait(5)
+        return super().execute_command(command, data)
+
+
+class AsyncContext(Context):
+
+    async def execute_command(self, command, data):
+        await asyncio.sleep(0)
+        return super().execute_command(command, data)
+
+
+class TestSalpylib(unittest.TestCase):
+    """Run the salpylib classes on a fake SALPY library."""
+
+    def setUp(self):
+        install_fake_salpy(DEVICE, SCHEMA)
+        self.to_close = []
+
+    def tearDown(self):
+        for item in reversed(self.to_close):
+            item.close()
+        uninstall_fake_salpy(DEVICE)
+
+    def test_shared_managers(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        mount = salpylib.DDSSubscriber(DEVICE, 'mountStatus')
+        self.to_close.append(mount)
+        other_mount = salpylib.DDSSubscriber(DEVICE, 'mountStatus')
+        self.to_close.append(other_mount)
+
+        # The two readers of mountStatus cannot share a manager
+        self.assertIs(mount.mgr, sender.manager)
+        self.assertIsNot(other_mount.mgr, mount.mgr)
+        self.assertEqual(len(MANAGER_POOL.managers(DEVICE)), 2)
+
+    def test_drain(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'mountStatus', nkeep=10)
+        self.to_close.append(subscriber)
+        publisher = sender.telemetry_publisher('mountStatus')
+        for i in range(20):
+            publisher.put(az=i)
+
+        self.assertEqual(subscriber.read_pending(), 20)
+        self.assertEqual(subscriber.getCurrent().az, 19)
+        self.assertEqual([sample.az for sample in subscriber.getLast(3)], [17, 18, 19])
+        self.assertEqual(len(subscriber.myDatalist), 10)
+
+        stats = subscriber.stats()
+        self.assertEqual((stats['read'], stats['max_read'], stats['history']), (20, 20, 10))
+        self.assertEqual(sender.telemetry_publisher('mountStatus').stats(), {'sent': 20})
+
+    def test_log_fields(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        with self.assertLogs('lsst.ts.salpytools.publisher', level='DEBUG') as logs:
+            sender.send_Telemetry('mountStatus', az=1.)
+            sender.send_Event('target', targetId=2)
+        self.assertIn('fakelib_logevent_target.targetId = 2', logs.output[-1])
+
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        sender.log_fields = False
+        self.assertFalse(sender.telemetry_publisher('mountStatus').log_fields)
+
+    def test_sample_times(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'mountStatus')
+        self.to_close.append(subscriber)
+        self.assertIsNone(subscriber.age())
+        self.assertIsNone(subscriber.getCurrent(max_age=1))
+
+        start = time.monotonic()
+        sender.send_Telemetry('mountStatus', az=1)
+        subscriber.read_pending()
+        (sample, times), = subscriber.getLast(1, times=True)
+        self.assertEqual(sample.az, 1)
+        self.assertGreaterEqual(times.received, start)
+        self.assertAlmostEqual(times.sent, time.time(), delta=5)
+        self.assertEqual(subscriber.stats()['latency']['count'], 1)
+        self.assertEqual(subscriber.getCurrent(max_age=10).az, 1)
+
+        time.sleep(0.05)
+        self.assertGreaterEqual(subscriber.age(), 0.05)
+        self.assertIsNone(subscriber.getCurrent(max_age=0.01))
+
+    @unittest.skipIf(np is None, 'numpy is not available')
+    def test_columnar_receive_time(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'mountStatus', columnar=True)
+        self.to_close.append(subscriber)
+        sender.send_Telemetry('mountStatus', az=1.)
+        subscriber.read_pending()
+
+        (_, times), = subscriber.getLast(1, times=True)
+        self.assertEqual(subscriber.to_arrays()['rcv_time'].tolist(), [times.received])
+        self.assertEqual(subscriber.window(times.received, times.received + 1)['az'].tolist(), [1.])
+
+    def test_failing_callback(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        poller = salpylib.DDSPoller()
+        received = []
+
+        def failing(sample):
+            raise RuntimeError('callback error')
+
+        for topic in ('mountStatus', 'weather'):
+            subscriber = salpylib.DDSSubscriber(DEVICE, topic, nkeep=10)
+            self.to_close.append(subscriber)
+            poller.add_subscriber(subscriber, callback=failing)
+            subscriber.add_callback(received.append)
+        for i in range(2):
+            sender.send_Telemetry('mountStatus', az=float(i))
+            sender.send_Telemetry('weather', temperature=float(i))
+
+        with self.assertLogs(subscriber.log, level='ERROR') as logs:
+            poller.poll()
+        # All the samples of all the topics are read, and given to the other callbacks
+        self.assertEqual(len(received), 4)
+        self.assertEqual(len(logs.records), 4)
+        self.assertEqual(subscriber.stats()['read'], 2)
+
+    def test_command_subscriber_stats(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'enable', Stype='Command', tsleep=0.001)
+        self.to_close.append(subscriber)
+        subscriber.start()
+        sender.send_Command('enable', value=1)
+
+        wait_until(lambda: subscriber.stats()['read'] == 1)
+        self.assertEqual(subscriber.getCurrent().value, 1)
+        stats = subscriber.stats()
+        self.assertEqual((stats['read'], stats['max_read'], stats['read_time']['count'] > 0), (1, 1, True))
+
+    def test_wait_for(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'target', Stype='Event', tsleep=0.001)
+        self.to_close.append(subscriber)
+        subscriber.start()
+
+        # Publish once the wait has started, only the samples received during the wait are considered
+        def publish():
+            for target_id in (1, 2, 3):
+                sender.send_Event('target', targetId=target_id)
+
+        timer = threading.Timer(0.05, publish)
+        timer.start()
+        sample = subscriber.wait_for(lambda sample: sample.targetId >= 2, timeout=5)
+        timer.join()
+        self.assertEqual(sample.targetId, 2)
+
+        start = time.monotonic()
+        self.assertIsNone(subscriber.wait_for(lambda sample: sample.targetId == 1, timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_wait_event(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriber(DEVICE, 'target', Stype='Event', tsleep=0.001)
+        self.to_close.append(subscriber)
+        subscriber.start()
+
+        timer = threading.Timer(0.05, sender.send_Event, ('target', ), {'targetId': 7})
+        timer.start()
+        self.assertTrue(subscriber.waitEvent(timeout=5))
+        timer.join()
+        self.assertEqual(subscriber.getCurrentEvent().targetId, 7)
+
+        subscriber.resetEvent()
+        start = time.monotonic()
+        self.assertFalse(subscriber.waitEvent(timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_poller(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        poller = salpylib.DDSPoller()
+        received = []
+        for topic in ('mountStatus', 'weather'):
+            subscriber = salpylib.DDSSubscriber(DEVICE, topic)
+            self.to_close.append(subscriber)
+            poller.add_subscriber(subscriber, callback=received.append)
+        sender.send_Telemetry('mountStatus', az=1.)
+        sender.send_Telemetry('weather', temperature=2.)
+        poller.poll()
+
+        self.assertEqual(sorted(type(sample).__name__ for sample in received),
+                         ['fakelib_mountStatusSample', 'fakelib_weatherSample'])
+
+    def test_commands(self):
+        dispatcher = salpylib.DDSCommandDispatcher(Context(), ['enable', 'start'], tsleep=0.001)
+        dispatcher.start()
+        sender = salpylib.DDSSend(DEVICE, sleeptime=0.001)
+        sender.start()
+        self.to_close.append(sender)
+        try:
+            cmdid, (_, ack) = sender.send_Command('enable', value=1, wait_command=True, timeout=5)
+            self.assertEqual(ack, (salpylib.SAL__CMD_COMPLETE, 0, 'ENABLE 1'))
+
+            cmdid, (_, ack) = sender.send_Command('start', value=-1, wait_command=True, timeout=5)
+            self.assertEqual(ack[0], salpylib.SAL__CMD_FAILED)
+            self.assertEqual([ack[0] for ack in sender.cmd_responses[cmdid].acks],
+                             [salpylib.SAL__CMD_ACK, salpylib.SAL__CMD_INPROGRESS, salpylib.SAL__CMD_FAILED])
+            self.assertEqual(sender.stats()['commands'], 2)
+            self.assertEqual(sender.stats()['command_latency']['count'], 2)
+            self.assertEqual(dispatcher.stats()['enable']['completed'], 1)
+            self.assertEqual(dispatcher.stats()['start']['failed'], 1)
+        finally:
+            dispatcher.stop()
+            dispatcher.join()
+
+    def test_async_next(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriberMain(DEVICE, 'mountStatus', tsleep=0.001)
+        self.to_close.append(subscriber)
+
+        async def receive():
+            waiting = asyncio.ensure_future(subscriber.next(timeout=5))
+            await asyncio.sleep(0.01)
+            sender.send_Telemetry('mountStatus', az=1.)
+            first = await waiting
+            for i in range(2, 5):
+                sender.send_Telemetry('mountStatus', az=float(i))
+            streamed = []
+            async for sample in subscriber.stream():
+                streamed.append(sample.az)
+                if len(streamed) == 3:
+                    break
+            with self.assertRaises(asyncio.TimeoutError):
+                await subscriber.next(timeout=0.01)
+            return first.az, streamed
+
+        self.assertEqual(asyncio.run(receive()), (1., [2., 3., 4.]))
+
+    def test_async_overflow(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+
+        async def overflow(policy):
+            subscriber = salpylib.DDSSubscriberMain(DEVICE, 'mountStatus', tsleep=0.001, queue_size=2,
+                                                    overflow=policy)
+            self.to_close.append(subscriber)
+            sender.send_Telemetry('mountStatus', az=0.)
+            await subscriber.next(timeout=5)  # Creates the queue
+            for i in range(1, 4):
+                sender.send_Telemetry('mountStatus', az=float(i))
+            await asyncio.sleep(0.05)
+            samples = [(await subscriber.next(timeout=5)).az for _ in range(2)]
+            return samples, subscriber.stats()
+
+        samples, stats = asyncio.run(overflow('drop_oldest'))
+        self.assertEqual(samples, [2., 3.])
+        self.assertEqual((stats['read'], stats['dropped'], stats['max_queued']), (4, 1, 2))
+        self.assertEqual(asyncio.run(overflow('drop_newest'))[0], [1., 2.])
+        with self.assertRaises(ValueError):
+            salpylib.DDSSubscriberMain(DEVICE, 'weather', overflow='block')
+
+    def test_async_callbacks(self):
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        subscriber = salpylib.DDSSubscriberMain(DEVICE, 'mountStatus', tsleep=0.001)
+        self.to_close.append(subscriber)
+        received = []
+
+        async def callback(sample):
+            await asyncio.sleep(0)
+            received.append(sample.az)
+
+        async def failing(sample):
+            raise RuntimeError('callback error')
+
+        async def receive():
+            subscriber.add_callback(callback)
+            subscriber.add_callback(received.append)
+            subscriber.add_callback(failing)
+            sender.send_Telemetry('mountStatus', az=1.)
+            while len(received) < 2:
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.01)
+
+        with self.assertLogs(subscriber.log, level='ERROR') as logs:
+            asyncio.run(receive())
+        self.assertEqual(len(received), 2)
+        self.assertIn('callback error', '\n'.join(logs.output))
+        self.assertEqual(len(subscriber._tasks), 0)
+
+    def controller_and_sender(self, context, **kwargs):
+        controller = salpylib.DDSController(context, command='enable', **kwargs)
+        self.to_close.append(controller)
+        sender = salpylib.DDSSend(DEVICE, sleeptime=0.001)
+        sender.start()
+        self.to_close.append(sender)
+        return controller, sender
+
+    def test_controller_queue(self):
+        context = BlockingContext()
+        controller, sender = self.controller_and_sender(context, max_concurrent=1, queue_size=1)
+        cmdids = [sender.send_Command('enable', value=i)[0] for i in range(3)]
+        self.assertEqual(controller.accept_pending(), 3)
+
+        # One running, one queued and the last one rejected
+        stats = controller.stats()
+        self.assertEqual((stats['running'], stats['pending'], stats['rejected']), (1, 1, 1))
+        self.assertEqual(sender.waitForCompletion(cmdids[2], timeout=5)[1][0], salpylib.SAL__CMD_NOPERM)
+
+        context.gate.set()
+        for i, cmdid in enumerate(cmdids[:2]):
+            self.assertEqual(sender.waitForCompletion(cmdid, timeout=5)[1],
+                             (salpylib.SAL__CMD_COMPLETE, 0, 'ENABLE {}'.format(i)))
+        wait_until(lambda: controller.running == 0)
+        stats = controller.stats()
+        self.assertEqual((stats['running'], stats['pending'], stats['completed'], stats['max_pending']),
+                         (0, 0, 2, 1))
+
+    def test_controller_ack_latency(self):
+        controller, sender = self.controller_and_sender(Context())
+        cmdid, _ = sender.send_Command('enable', value=1)
+        # The time the command waits to be polled counts
+        time.sleep(0.05)
+        controller.accept_pending()
+        self.assertEqual(sender.waitForCompletion(cmdid, timeout=5)[1][0], salpylib.SAL__CMD_COMPLETE)
+        latency = controller.stats()['ack_latency']
+        self.assertEqual(latency['count'], 1)
+        self.assertGreaterEqual(latency['min'], 0.05)
+
+    def test_controller_concurrent(self):
+        context = BlockingContext()
+        controller, sender = self.controller_and_sender(context, max_concurrent=2)
+        cmdids = [sender.send_Command('enable', value=i)[0] for i in range(2)]
+        controller.accept_pending()
+        self.assertEqual(controller.stats()['running'], 2)
+
+        context.gate.set()
+        for cmdid in cmdids:
+            self.assertEqual(sender.waitForCompletion(cmdid, timeout=5)[1][0], salpylib.SAL__CMD_COMPLETE)
+
+    def test_controller_queued_start_fails(self):
+        context = BlockingContext()
+        controller, sender = self.controller_and_sender(context, queue_size=1)
+        cmdids = [sender.send_Command('enable', value=i)[0] for i in range(2)]
+        controller.accept_pending()
+        first = controller.reply_thread
+        controller.executor.shutdown(wait=False)
+
+        # The queued command cannot be started when the first one is done
+        context.gate.set()
+        first.result(timeout=5)
+        self.assertEqual(sender.waitForCompletion(cmdids[1], timeout=5)[1][0], salpylib.SAL__CMD_FAILED)
+        wait_until(lambda: controller.running == 0)
+        stats = controller.stats()
+        self.assertEqual((stats['running'], stats['pending'], stats['failed']), (0, 0, 1))
+
+    def test_controller_coroutine(self):
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            controller, sender = self.controller_and_sender(AsyncContext(), loop=loop)
+            cmdid, _ = sender.send_Command('enable', value=3)
+            controller.accept_pending()
+            self.assertEqual(sender.waitForCompletion(cmdid, timeout=5)[1],
+                             (salpylib.SAL__CMD_COMPLETE, 0, 'ENABLE 3'))
+            self.assertEqual(controller.stats()['ack_latency']['count'], 1)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+        with self.assertRaises(ValueError):
+            salpylib.DDSController(AsyncContext(), command='enable')
+
+    def test_command_wakes_up_sender(self):
+        sender = salpylib.DDSSend(DEVICE, sleeptime=30)
+        sender.start()
+        self.to_close.append(sender)
+        wait_until(lambda: sender.interval.npolls == 1)
+
+        # The thread sleeps for 30 s, a new command must wake it up to read the acks
+        sender.send_Command('enable', value=1)
+        wait_until(lambda: sender.interval.npolls == 2, timeout=2)
+        self.assertEqual(sender.interval.npolls, 2)
+
+    def test_sender_errors(self):
+        dispatcher = salpylib.DDSCommandDispatcher(Context(), ['enable'], tsleep=0.001)
+        dispatcher.start()
+        sender = salpylib.DDSSend(DEVICE, sleeptime=0.001)
+        self.to_close.append(sender)
+        calls = []
+
+        def failing(ack):
+            calls.append(ack)
+            if len(calls) == 1:
+                raise RuntimeError('getResponse error')
+            return 0
+
+        try:
+            cmdid, _ = sender.send_Command('enable', value=1)
+            # A listener whose event loop is closed is dropped
+            loop = asyncio.new_event_loop()
+            sender.cmd_responses[cmdid].add_listener(loop)
+            loop.close()
+            sender._ack_readers = (failing, ) + sender._ack_readers
+            with self.assertLogs(sender.log, level='ERROR'):
+                sender.start()
+                _, ack = sender.waitForCompletion(cmdid, timeout=5)
+            self.assertEqual(ack, (salpylib.SAL__CMD_COMPLETE, 0, 'ENABLE 1'))
+            self.assertTrue(sender.is_alive())
+            self.assertEqual(sender.cmd_responses[cmdid]._listeners, [])
+        finally:
+            dispatcher.stop()
+            dispatcher.join()
+
+    def test_sequencer(self):
+        dispatcher = salpylib.DDSCommandDispatcher(Context(), ['enable', 'start'], tsleep=0.001,
+                                                   max_concurrent=2)
+        dispatcher.start()
+        try:
+            sequencer = salpylib.CommandSequencer([salpylib.CommandStep(DEVICE, 'enable', {'value': 1}),
+                                                   salpylib.CommandStep(DEVICE, 'start', {'value': -1}),
+                                                   salpylib.CommandStep(DEVICE, 'enable', {'value': 2},
+                                                                        name='again', after='fakelib.start')],
+                                                  timeout=5)
+            self.to_close.append(sequencer)
+            report = sequencer.run()
+        finally:
+            dispatcher.stop()
+            dispatcher.join()
+
+        self.assertEqual([step['status'] for step in report], ['complete', 'failed', 'skipped'])
+        self.assertIn('complete', report[0]['latency'])
+
+    def test_sequencer_unknown_command(self):
+        dispatcher = salpylib.DDSCommandDispatcher(Context(), ['enable'], tsleep=0.001)
+        dispatcher.start()
+        try:
+            steps = [salpylib.CommandStep(DEVICE, 'nosuch'),
+                     salpylib.CommandStep(DEVICE, 'enable', {'value': 1}),
+                     salpylib.CommandStep(DEVICE, 'enable', {'value': 2}, name='after',
+                                          after='fakelib.nosuch')]
+            sequencer = salpylib.CommandSequencer(steps, timeout=5)
+            self.to_close.append(sequencer)
+            report = sequencer.run()
+        finally:
+            dispatcher.stop()
+            dispatcher.join()
+
+        self.assertEqual([step['status'] for step in report], ['failed', 'complete', 'skipped'])
+        # Only the stages whose acks were received have a latency
+        self.assertEqual(set(report[1]['latency']), {'ack', 'inprogress', 'complete'})
+        self.assertEqual(report[0]['latency'], {})
+
+    def test_container(self):
+        container = salpylib.DDSSubscriberContainer(DEVICE, stype='Telemetry', tsleep=0.001)
+        self.to_close.append(container)
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+        sender.send_Telemetry('weather', temperature=3.)
+
+        self.assertEqual(sorted(container.topic), ['mountStatus', 'weather'])
+        wait_until(lambda: container.cache.version >= 1)
+        # The topics are read with getCurrent(), not from the SALPY struct overwritten by the reads
+        self.assertEqual(container.weather.temperature, 3.)
+        self.assertIs(container.weather, container.subscribers['weather'].getCurrent())
+
+        version, changes = container.changed_since(0)
+        self.assertEqual(changes, {'fakelib_weather': {'temperature': 3.}})
+        self.assertEqual(container.stats()['cache']['changes'], 1)
+
+        container.close()
+        self.to_close.remove(container)
+        self.assertFalse(container.poller.is_alive())
+
+    def test_shared_cache(self):
+        telemetry = salpylib.DDSSubscriberContainer(DEVICE, stype='Telemetry', tsleep=0.001,
+                                                    deadbands={'weather': {'temperature': 1.}})
+        self.to_close.append(telemetry)
+        events = salpylib.DDSSubscriberContainer(DEVICE, stype='Event', tsleep=0.001, poller=telemetry.poller,
+                                                 cache=telemetry.cache)
+        self.to_close.append(events)
+        sender = salpylib.DDSSend(DEVICE)
+        self.to_close.append(sender)
+
+        # The event and the telemetry named weather do not overwrite each other
+        sender.send_Telemetry('weather', temperature=3.)
+        sender.send_Event('weather', temperature=4.)
+        wait_until(lambda: telemetry.cache.version >= 2)
+        version, changes = events.changed_since(0)
+        self.assertEqual(changes, {'fakelib_weather': {'temperature': 3.},
+                                   'fakelib_logevent_weather': {'temperature': 4.}})
+
+        # Within the deadband of the telemetry
+        sender.send_Telemetry('weather', temperature=3.5)
+        wait_until(lambda: telemetry.cache.nupdates >= 3)
+        self.assertEqual(telemetry.changed_since(version), (version, {}))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
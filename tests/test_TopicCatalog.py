@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import tempfile
+import importlib
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.topic_catalog import TopicCatalog
+
+SALPY_SOURCE = '''
+class SAL_catdev:
+    pass
+
+
+class catdev_ackcmdC:
+    def __init__(self):
+        self.ack = 0
+
+
+class catdev_mountStatusC:
+    def __init__(self):
+        self.az = 0.
+        self.position = [0., 0.]
+
+
+class catdev_logevent_targetC:
+    def __init__(self):
+        self.targetId = 0
+
+
+class catdev_command_enableC:
+    def __init__(self):
+        self.value = False
+'''
+
+
+class TestTopicCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmpdir, 'SALPY_catdev.py'), 'w') as module_file:
+            module_file.write(SALPY_SOURCE)
+        sys.path.insert(0, self.tmpdir)
+        self.SALPY_lib = importlib.import_module('SALPY_catdev')
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        sys.modules.pop('SALPY_catdev', None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_topics(self):
+        catalog = TopicCatalog('catdev', self.SALPY_lib)
+
+        self.assertEqual(catalog.telemetry, ('mountStatus', ))
+        self.assertEqual(catalog.events, ('target', ))
+        self.assertEqual(catalog.commands, ('enable', ))
+        self.assertIs(catalog.data_class('target', 'Event'), self.SALPY_lib.catdev_logevent_targetC)
+        self.assertEqual(catalog.by_name('catdev_command_enable').topic, 'enable')
+        self.assertEqual(catalog.get('mountStatus').layout, (('az', 'float', None), ('position', 'float', 2)))
+        with self.assertRaises(AttributeError):
+            catalog.get('target', 'Telemetry')
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        TopicCatalog('catdev', self.SALPY_lib, cache_dir=cache_dir).events
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, 'SALPY_catdev.json')))
+
+        catalog = TopicCatalog('catdev', self.SALPY_lib, cache_dir=cache_dir)
+        catalog._enumerate = None  # Must not be needed
+        self.assertEqual(catalog.get('mountStatus').layout, (('az', 'float', None), ('position', 'float', 2)))
+
+        # A newer module invalidates the cache
+        mtime = os.path.getmtime(self.SALPY_lib.__file__) + 10
+        os.utime(self.SALPY_lib.__file__, (mtime, mtime))
+        self.assertIsNone(TopicCatalog('catdev', self.SALPY_lib, cache_dir=cache_dir)._read_cache())
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
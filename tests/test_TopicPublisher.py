@@ -0,0 +1,130 @@
+import time
+import types
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.publisher import TopicPublisher
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class dev_mountStatusC:
+    """Stand-in for a SALPY struct."""
+    def __init__(self):
+        self.az = 0.
+        self.el = 0.
+
+
+class dev_logevent_targetC:
+    """Stand-in for a SALPY struct."""
+    def __init__(self):
+        self.targetId = 0
+
+
+class Manager:
+    """Stand-in for a SAL manager, keeping what is published."""
+    SALPY_lib = types.SimpleNamespace(dev_mountStatusC=dev_mountStatusC,
+                                      dev_logevent_targetC=dev_logevent_targetC)
+    device_id = None
+
+    def __init__(self):
+        self.registered = []
+        self.sent = []
+
+    def salTelemetryPub(self, topic):
+        self.registered.append(topic)
+
+    def salEvent(self, topic):
+        self.registered.append(topic)
+
+    def putSample_mountStatus(self, data):
+        self.sent.append((data.az, data.el))
+        return 0
+
+    def logEvent_target(self, data, priority):
+        self.sent.append((data.targetId, priority))
+        return 0
+
+
+class TestTopicPublisher(unittest.TestCase):
+
+    def test_put_reuses_struct(self):
+        manager = Manager()
+        publisher = TopicPublisher(manager, 'dev', 'mountStatus')
+        publisher.put(az=1., el=2.)
+        publisher.put(az=3.)
+
+        self.assertEqual(manager.registered, ['dev_mountStatus'])
+        self.assertEqual(manager.sent, [(1., 2.), (3., 2.)])
+        self.assertEqual(publisher.nsent, 2)
+
+    def test_make_data(self):
+        manager = Manager()
+        publisher = TopicPublisher(manager, 'dev', 'mountStatus')
+        publisher.put(az=1., el=2.)
+        publisher.publish(publisher.make_data(az=3.))
+
+        self.assertEqual(manager.sent[-1], (3., 0.))
+
+    def test_setter(self):
+        publisher = TopicPublisher(Manager(), 'dev', 'mountStatus')
+        publisher.setter('az')(5.)
+
+        self.assertEqual(publisher.data.az, 5.)
+        with self.assertRaises(AttributeError):
+            publisher.setter('ra')
+
+    def test_event(self):
+        manager = Manager()
+        publisher = TopicPublisher(manager, 'dev', 'target', stype='Event', priority=2)
+        publisher.put(targetId=7)
+        publisher.publish(priority=5)
+
+        self.assertEqual(manager.registered, ['dev_logevent_target'])
+        self.assertEqual(manager.sent, [(7, 2), (7, 5)])
+
+    def test_publish_many(self):
+        manager = Manager()
+        publisher = TopicPublisher(manager, 'dev', 'mountStatus')
+
+        self.assertEqual(publisher.publish_many([{'az': 1.}, {'el': 2.}]), 2)
+        self.assertEqual(publisher.publish_many([(3., 4.), (5., 6.)], fields=('el', 'az')), 2)
+        self.assertEqual(manager.sent, [(1., 0.), (1., 2.), (4., 3.), (6., 5.)])
+        with self.assertRaises(AttributeError):
+            publisher.publish_many([(1., )], fields=('ra', ))
+        # The order of the fields of tuple rows must be given
+        with self.assertRaises(ValueError):
+            publisher.publish_many([(1., 2.)])
+        self.assertEqual(len(manager.sent), 4)
+
+    @unittest.skipIf(np is None, 'numpy is not available')
+    def test_publish_many_structured_array(self):
+        manager = Manager()
+        publisher = TopicPublisher(manager, 'dev', 'mountStatus')
+        rows = np.zeros(3, dtype=[('az', float), ('el', float)])
+        rows['az'] = [1., 2., 3.]
+        publisher.publish_many(rows)
+
+        self.assertEqual(manager.sent, [(1., 0.), (2., 0.), (3., 0.)])
+
+    def test_publish_many_rate(self):
+        publisher = TopicPublisher(Manager(), 'dev', 'mountStatus')
+        t0 = time.monotonic()
+        publisher.publish_many([{'az': 1.}] * 5, rate=100.)
+
+        self.assertGreaterEqual(time.monotonic() - t0, 0.04)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
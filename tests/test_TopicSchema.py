@@ -0,0 +1,65 @@
+import unittest
+import lsst.utils.tests
+from lsst.ts.salpytools.topic_schema import get_schema, TopicSample
+
+
+class scheduler_logevent_targetC:
+    """Stand-in for a SALPY struct."""
+    def __init__(self):
+        self.targetId = 0
+        self.ra = 0.
+        self.position = [0., 0., 0.]
+        self.note = ''
+
+
+class TestTopicSchema(unittest.TestCase):
+
+    def test_fields(self):
+        schema = get_schema(scheduler_logevent_targetC())
+
+        self.assertEqual(schema.fields, ('note', 'position', 'ra', 'targetId'))
+        self.assertEqual(schema.array_fields, (1, ))
+        self.assertEqual(schema.types, (str, float, float, int))
+        self.assertEqual(schema.lengths, (None, 3, None, None))
+        self.assertEqual(schema.sample_class.__name__, 'scheduler_logevent_targetSample')
+
+    def test_schema_is_cached(self):
+        self.assertIs(get_schema(scheduler_logevent_targetC()),
+                      get_schema(scheduler_logevent_targetC()))
+
+    def test_as_dict(self):
+        data = scheduler_logevent_targetC()
+        data.targetId = 5
+
+        self.assertEqual(get_schema(data).as_dict(data), {'note': '', 'position': [0., 0., 0.],
+                                                          'ra': 0., 'targetId': 5})
+
+    def test_snapshot_is_a_copy(self):
+        data = scheduler_logevent_targetC()
+        schema = get_schema(data)
+
+        data.targetId = 1
+        data.position[0] = 1.
+        sample = schema.snapshot(data)
+        data.targetId = 2
+        data.position[0] = 2.
+
+        self.assertIsInstance(sample, TopicSample)
+        self.assertEqual(sample.targetId, 1)
+        self.assertEqual(sample.position, (1., 0., 0.))
+        self.assertEqual(sample._asdict()['targetId'], 1)
+        with self.assertRaises(AttributeError):
+            sample.targetId = 3
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()